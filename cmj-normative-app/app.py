@@ -1,7 +1,31 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-from io import BytesIO
+import hashlib
+
+from cmj_norms.bootstrap import (BOOTSTRAP_CONFIDENCE, BOOTSTRAP_REPLICATES, add_confidence_intervals,
+                                 bootstrap_percentile_cis)
+from cmj_norms.charts import box_chart, histogram_chart, violin_chart
+from cmj_norms.dates import DateIndexedData, detect_time_column, parse_test_timestamps
+from cmj_norms.diagnostics import StageTimer
+from cmj_norms.distributions import athlete_latest_value, position_histograms
+from cmj_norms.export import EXCEL_FILE_NAME, INDIVIDUAL_CSV_NAME, build_excel_sheets, normative_csv_name, to_excel
+from cmj_norms.history import append_to_history, history_version, read_history, sample_history
+from cmj_norms.ingest import (TEST_TYPE_COLUMN, combine_exports, compact_schema, default_metric_columns,
+                              detect_athlete_column, detect_date_columns, detect_position_column, file_digest,
+                              load_data, load_files, memory_footprint, repeated_tests, restore_float64, sniff_data,
+                              source_columns)
+from cmj_norms.longitudinal import ATHLETE_BASELINE_TESTS, MIN_BASELINE_TESTS, POSITION_BASELINE_DAYS
+from cmj_norms.matching import (FULL_NAME_COLUMN, combine_name_columns, detect_name_columns,
+                                resolve_roster_names, roster_with_athlete_column)
+from cmj_norms.norms import calculate_position_norms
+from cmj_norms.pipeline import (assemble_individual_results, filter_individual_results, individual_base_columns,
+                                individual_metric_columns, merge_roster, select_analysis_rows, validate_columns)
+from cmj_norms.screening import (SCREENING_ACTIONS, SCREENING_MIN_TESTS, SCREENING_REASON_COLUMN,
+                                 SCREENING_Z_THRESHOLD, screen_tests, screening_report)
+from cmj_norms.sessions import SESSION_AGGREGATIONS, aggregate_sessions
+from cmj_norms.sketch import SKETCH_LEVEL_SIZE, stream_position_norms
+from cmj_norms.styling import style_normative_table, style_results_page
+from cmj_norms.trends import MIN_TREND_TESTS, TREND_PERIOD_DAYS, athlete_trends
 
 st.set_page_config(page_title="CMJ Normative Performance Analysis", layout="wide")
 
@@ -53,10 +77,12 @@ st.header("Upload Files")
 col1, col2 = st.columns(2)
 
 with col1:
-    cmj_file = st.file_uploader(
+    cmj_files = st.file_uploader(
         "Upload CMJ Data (CSV/Excel)",
         type=['csv', 'xlsx'],
-        help="Upload your countermovement jump performance data"
+        accept_multiple_files=True,
+        help="Upload your countermovement jump performance data. Several exports (e.g. one per day or group) "
+             "are combined, and tests repeated across overlapping exports are counted once."
     )
 
 with col2:
@@ -66,118 +92,517 @@ with col2:
         help="Upload team roster with athlete names and positions"
     )
 
+use_history = st.checkbox(
+    "Save CMJ uploads to test history",
+    value=False,
+    help="Keep every uploaded test in a local history store. Each upload only adds tests that are "
+         "not already saved, so you can upload just the latest testing day. Analysis uses the full saved history."
+)
 
-def load_data(file):
-    """Load data from CSV or Excel file"""
-    if file is not None:
-        if file.name.endswith('.csv'):
-            df = pd.read_csv(file)
+use_streaming = st.checkbox(
+    "Streaming mode for very large CSV exports",
+    value=False,
+    help="Read the CMJ CSV in chunks and compute normative values with bounded memory. "
+         "Percentiles are approximate for positions with very many tests; individual results and date filtering are not available."
+)
+
+
+# Page size choices for the Individual Results table
+RESULTS_PAGE_SIZES = [25, 50, 100, 250]
+
+# Number of distinct uploads (and derived merges) kept in the ingestion cache;
+# least recently used entries are evicted first
+INGESTION_CACHE_ENTRIES = 8
+# Number of per-metric results (norms, intervals, rank columns) kept
+METRIC_CACHE_ENTRIES = 64
+
+@st.cache_data(max_entries=INGESTION_CACHE_ENTRIES, show_spinner="Reading file...")
+def load_data_cached(digest, file_name, _file):
+    """Load an uploaded file once per unique content
+
+    Keyed on the content digest and file name only, so widget reruns reuse
+    the parsed frame instead of re-reading the upload.
+    """
+    _file.seek(0)
+    return load_data(_file)
+
+@st.cache_data(max_entries=INGESTION_CACHE_ENTRIES, show_spinner="Finding tests repeated across files...")
+def repeated_tests_cached(digest, file_names, athlete_col, date_column, _files):
+    """Tests of the CMJ exports already present in an earlier file, once per (contents, identity columns)
+
+    Every column is read, so which tests repeat does not depend on the
+    metrics selected for the analysis.
+    """
+    for file in _files:
+        file.seek(0)
+    frames = [combine_name_columns(frame)[0] for frame in load_files(_files)]
+    return repeated_tests(frames, athlete_col, date_column)
+
+@st.cache_data(max_entries=INGESTION_CACHE_ENTRIES, show_spinner="Reading files...")
+def load_cmj_cached(digest, file_names, columns, identity, _files):
+    """Load the given columns of the CMJ exports once per (contents, columns), in the compact schema
+
+    Files are parsed concurrently and combined, dropping tests repeated
+    from an earlier file; identity is the (athlete, date) column pair that
+    identifies a test across files. Returns (data, bytes the data used
+    before compacting, upload report).
+    """
+    repeated = repeated_tests_cached(digest, file_names, *identity, _files) if len(_files) > 1 else None
+    for file in _files:
+        file.seek(0)
+    data, upload_report = combine_exports(load_files(_files, usecols=columns), list(file_names), repeated)
+    data, _ = combine_name_columns(data)
+    return compact_schema(data), memory_footprint(data), upload_report
+
+@st.cache_data(max_entries=INGESTION_CACHE_ENTRIES, show_spinner=False)
+def sniff_cmj_cached(digest, file_name, _file):
+    """Header and first rows of a CMJ export, to configure the analysis before the full load"""
+    _file.seek(0)
+    return combine_name_columns(sniff_data(_file))[0]
+
+@st.cache_data(max_entries=INGESTION_CACHE_ENTRIES, show_spinner="Parsing test dates...")
+def index_dates_cached(data_key, date_column, time_column, _cmj_data):
+    """Parse test dates (and times) and sort by them once per (file content and loaded columns, date columns)"""
+    return DateIndexedData.build(_cmj_data, date_column, time_column)
+
+@st.cache_data(max_entries=INGESTION_CACHE_ENTRIES, show_spinner="Combining tests by session...")
+def aggregate_sessions_cached(cache_key, athlete_id_column, date_column, metric_columns, method, _cmj_data):
+    """One row per athlete per test day, once per (data, columns, metrics, method)
+
+    cache_key identifies the upload, the columns loaded from it and the date
+    filter applied to it.
+    """
+    return aggregate_sessions(_cmj_data, athlete_id_column, date_column, list(metric_columns), method)
+
+@st.cache_data(max_entries=INGESTION_CACHE_ENTRIES, show_spinner=False)
+def merge_roster_cached(cache_key, athlete_id_column, position_column, match_names, _cmj_data, _roster_data):
+    """Left-join positions from the roster onto the CMJ data
+
+    cache_key identifies both uploads, the columns loaded from the CMJ
+    export and the date filter and session aggregation applied to it, so
+    changing display options reuses the merge. With
+    match_names, CMJ names are first resolved to roster names. Returns
+    (merged data, name match report or None).
+    """
+    name_matches = None
+    if match_names:
+        _cmj_data, name_matches = resolve_roster_names(_cmj_data, _roster_data, athlete_id_column)
+    return merge_roster(_cmj_data, _roster_data, athlete_id_column, position_column), name_matches
+
+@st.cache_data(max_entries=2, show_spinner="Reading test history...")
+def sample_history_cached(version):
+    """First stored tests and the stored test count, to configure the analysis before the full read"""
+    sample, n_tests = sample_history()
+    if sample is None:
+        return None, 0
+    return combine_name_columns(sample)[0], n_tests
+
+@st.cache_data(max_entries=2, show_spinner="Parsing test dates...")
+def index_history_dates_cached(version, date_column):
+    """Only the stored test dates, sorted, for the date filter options"""
+    return DateIndexedData.build(read_history(columns=[date_column]), date_column)
+
+@st.cache_data(max_entries=2, show_spinner="Reading test history...")
+def read_history_cached(version, columns, date_filter_key):
+    """Read the analyzed columns and tests once per (store version, columns, date filter)
+
+    Only these columns, and with a date filter only the matching tests, are
+    read from the store. Returns (data in the compact schema, bytes the data
+    used before compacting); a year filter adds a Year column, as
+    DateIndexedData.years does.
+    """
+    date_filter = {}
+    if date_filter_key is not None:
+        date_column, filter_type, *selection = date_filter_key
+        if filter_type == 'Year':
+            date_filter = {'years': selection[0]}
         else:
-            df = pd.read_excel(file)
-        
-        # Strip whitespace from column names
-        df.columns = df.columns.str.strip()
-        return df
-    return None
-
-def calculate_percentiles(data, metric_col):
-    """Calculate percentile values for the data"""
-    return {
-        'P25': np.percentile(data[metric_col].dropna(), 25),
-        'P50': np.percentile(data[metric_col].dropna(), 50),
-        'P75': np.percentile(data[metric_col].dropna(), 75),
-        'P90': np.percentile(data[metric_col].dropna(), 90),
-        'Mean': data[metric_col].mean(),
-        'SD': data[metric_col].std(),
-        'Min': data[metric_col].min(),
-        'Max': data[metric_col].max(),
-        'N': data[metric_col].notna().sum()
-    }
+            date_filter = {'start': selection[0], 'end': selection[1]}
+    data = read_history(columns=columns, **date_filter)
+    if 'years' in date_filter:
+        data = data.assign(Year=data[date_column].dt.year)
+    data, _ = combine_name_columns(data)
+    return compact_schema(data), memory_footprint(data)
+
+@st.cache_data(max_entries=INGESTION_CACHE_ENTRIES, show_spinner="Streaming CMJ data...")
+def stream_position_norms_cached(cache_key, athlete_id_column, position_column, metric_cols, _file, _roster_data):
+    """Run stream_position_norms once per (uploads, columns, metrics)"""
+    return stream_position_norms(_file, _roster_data, athlete_id_column, position_column, metric_cols)
+
+# Results below are memoized per metric: rows_key identifies the analyzed
+# rows (uploads, date filter, session aggregation, columns and the rows kept
+# by select_analysis_rows), so adding a metric that drops no rows computes
+# only that metric, and a new date range recomputes from the filter down
+# without re-parsing dates.
+
+def rows_digest(analysis_data):
+    """Digest of which merged rows are analyzed"""
+    return hashlib.sha256(analysis_data.index.to_numpy().tobytes()).hexdigest()
+
+@st.cache_data(max_entries=METRIC_CACHE_ENTRIES, show_spinner=False)
+def metric_norms_cached(rows_key, position_column, metric_col, _analysis_data):
+    """One metric's normative table, once per (rows, metric)"""
+    return calculate_position_norms(_analysis_data, position_column, [metric_col])[metric_col]
+
+@st.cache_data(max_entries=METRIC_CACHE_ENTRIES, show_spinner=False)
+def metric_histograms_cached(rows_key, position_column, metric_col, _analysis_data):
+    """Per-position histogram of one metric: HISTOGRAM_BINS rows per position, whatever the row count"""
+    return position_histograms(_analysis_data, position_column, metric_col)
+
+@st.cache_data(max_entries=METRIC_CACHE_ENTRIES, show_spinner="Bootstrapping confidence intervals...")
+def metric_cis_cached(rows_key, position_column, metric_col, _analysis_data):
+    """Bootstrap intervals for one metric; seeded per metric and position, so safe to cache"""
+    return bootstrap_percentile_cis(_analysis_data, position_column, [metric_col])[metric_col]
+
+@st.cache_data(max_entries=INGESTION_CACHE_ENTRIES, show_spinner=False)
+def baseline_timestamps_cached(rows_key, display_date_column, _analysis_data):
+    """Test date/time of each analyzed row, for rolling baselines"""
+    return parse_test_timestamps(
+        _analysis_data, display_date_column, detect_time_column(_analysis_data, display_date_column)
+    )
+
+@st.cache_data(max_entries=METRIC_CACHE_ENTRIES, show_spinner=False)
+def metric_trends_cached(rows_key, athlete_id_column, position_column, metric_col, display_date_column,
+                         _analysis_data):
+    """Every athlete's trend for one metric, once per (rows, metric)"""
+    return athlete_trends(
+        _analysis_data, athlete_id_column, position_column, metric_col,
+        baseline_timestamps_cached(rows_key, display_date_column, _analysis_data)
+    )
+
+@st.cache_data(max_entries=METRIC_CACHE_ENTRIES, show_spinner="Ranking tests...")
+def metric_results_cached(rows_key, athlete_id_column, position_column, metric_col, display_date_column,
+                          baselines, _analysis_data):
+    """One metric's Individual Results columns, once per (rows, metric, baseline settings)"""
+    if baselines is None:
+        return individual_metric_columns(_analysis_data, athlete_id_column, position_column, [metric_col])
+    last_n, window_days = baselines
+    return individual_metric_columns(
+        _analysis_data, athlete_id_column, position_column, [metric_col],
+        baseline_timestamps=baseline_timestamps_cached(rows_key, display_date_column, _analysis_data),
+        last_n=last_n, window_days=window_days
+    )
+
+@st.cache_data(max_entries=INGESTION_CACHE_ENTRIES, show_spinner="Ranking tests...")
+def build_individual_results_cached(rows_key, athlete_id_column, position_column, metric_columns,
+                                    display_date_column, baselines, _analysis_data):
+    """Individual Results for one analysis, assembled from the per-metric columns
+
+    baselines is None or (last N tests, position window days); rolling
+    baselines rank each test against earlier tests by the display date.
+    """
+    base_columns = individual_base_columns(_analysis_data, athlete_id_column, position_column, display_date_column)
+    metric_frames = [
+        metric_results_cached(rows_key, athlete_id_column, position_column, metric_col, display_date_column,
+                              baselines, _analysis_data)
+        for metric_col in metric_columns
+    ]
+    return assemble_individual_results(base_columns, metric_frames, metric_columns)
+
+# Number of exported files (CSV tables) kept in the export cache
+EXPORT_CACHE_ENTRIES = 32
+
+@st.cache_data(max_entries=EXPORT_CACHE_ENTRIES, show_spinner=False)
+def to_csv_cached(cache_key, _df):
+    """CSV bytes of a result table, built once per analysis
+
+    cache_key identifies the analysis (uploads, filter, columns and metrics)
+    and the table within it.
+    """
+    return _df.to_csv(index=False).encode('utf-8')
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def build_excel_cached(cache_key, _individual_df, _analysis_data, _normative_dfs):
+    """Complete analysis workbook, built on first download and once per analysis"""
+    return to_excel(build_excel_sheets(_individual_df, _analysis_data, _normative_dfs)).getvalue()
+
+@st.fragment
+def show_results_page(individual_df, metric_columns, positions, timer):
+    """Filter, sort and page the Individual Results on the server; only the visible page is styled
+
+    A fragment: changing its filters, sort or page reruns only this part of
+    the app, not the analysis above it.
+    """
+    with st.expander("Filter Results"):
+        col1, col2 = st.columns(2)
+        with col1:
+            selected_athletes = st.multiselect(
+                "Athletes",
+                options=sorted(individual_df['Athlete'].unique()),
+                help="Leave empty to show all athletes"
+            )
+        with col2:
+            selected_positions = st.multiselect(
+                "Positions",
+                options=positions,
+                help="Leave empty to show all positions"
+            )
 
-def sanitize_sheet_name(name, max_length=31):
-    """Sanitize string to be a valid Excel sheet name
+        results_start_date = results_end_date = None
+        valid_test_dates = individual_df['Test Date'][individual_df['Test Date'] != 'N/A'] if 'Test Date' in individual_df.columns else []
+        if len(valid_test_dates) > 0:
+            first_test_date = pd.to_datetime(valid_test_dates.min()).date()
+            last_test_date = pd.to_datetime(valid_test_dates.max()).date()
+            col1, col2 = st.columns(2)
+            with col1:
+                results_start_date = st.date_input(
+                    "Tests From",
+                    value=first_test_date,
+                    min_value=first_test_date,
+                    max_value=last_test_date,
+                    key="results_start_date"
+                )
+            with col2:
+                results_end_date = st.date_input(
+                    "Tests To",
+                    value=last_test_date,
+                    min_value=first_test_date,
+                    max_value=last_test_date,
+                    key="results_end_date"
+                )
+            # The full span is no filter, so undated tests stay visible
+            if (results_start_date, results_end_date) == (first_test_date, last_test_date):
+                results_start_date = results_end_date = None
+
+    visible_results = timer.run(
+        'filter_results', filter_individual_results,
+        individual_df, selected_athletes, selected_positions, results_start_date, results_end_date
+    )
 
-    Excel sheet name rules:
-    - Max 31 characters
-    - Cannot contain: \ / ? * [ ] :
-    - Cannot start or end with apostrophe
+    col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
+    with col1:
+        sort_column = st.selectbox(
+            "Sort by",
+            options=individual_df.columns.tolist(),
+            index=individual_df.columns.tolist().index(f'{metric_columns[0]}_Percentile')
+        )
+    with col2:
+        sort_descending = st.toggle("Descending", value=True)
+    with col3:
+        page_size = st.selectbox("Rows per page", options=RESULTS_PAGE_SIZES, index=1)
+    page_count = max(1, -(-len(visible_results) // page_size))
+    with col4:
+        page_number = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+
+    visible_results = timer.run(
+        'sort_results', visible_results.sort_values, sort_column, ascending=not sort_descending, kind='stable'
+    )
+    first_row = (page_number - 1) * page_size
+    page_df = visible_results.iloc[first_row:first_row + page_size]
+
+    with timer.stage('results_styling'):
+        st.dataframe(style_results_page(page_df, metric_columns), width="stretch", hide_index=True)
+    st.caption(
+        f"Showing {min(first_row + 1, len(visible_results))}-{first_row + len(page_df)} of {len(visible_results)} records"
+        + (f" (filtered from {len(individual_df)})" if len(visible_results) < len(individual_df) else "")
+        + f" | Page {page_number} of {page_count}"
+    )
+
+@st.fragment
+def show_trends(rows_key, athlete_id_column, position_column, metric_columns, display_date_column, analysis_data,
+                timer):
+    """Per-athlete trend table for one metric, steepest decline first
+
+    A fragment: changing the metric or filters reruns only this section;
+    trends are computed for all athletes at once and cached per metric.
     """
-    # Remove invalid characters
-    invalid_chars = ['\\', '/', '?', '*', '[', ']', ':']
-    for char in invalid_chars:
-        name = name.replace(char, '_')
-
-    # Remove leading/trailing apostrophes and spaces
-    name = name.strip().strip("'")
-
-    # Truncate to max length
-    if len(name) > max_length:
-        name = name[:max_length]
-
-    # Ensure not empty
-    if not name:
-        name = "Sheet"
-
-    return name
-
-def to_excel(dataframes_dict):
-    """Convert multiple dataframes to Excel file in memory"""
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        for sheet_name, df in dataframes_dict.items():
-            # Sanitize sheet name to ensure it's valid for Excel
-            clean_sheet_name = sanitize_sheet_name(sheet_name)
-            df.to_excel(writer, sheet_name=clean_sheet_name, index=False)
-    output.seek(0)
-    return output
-
-def get_numeric_columns(df):
-    """Get list of numeric columns from dataframe"""
-    return df.select_dtypes(include=[np.number]).columns.tolist()
-
-def get_text_columns(df):
-    """Get list of text/object columns from dataframe"""
-    return df.select_dtypes(include=['object', 'string']).columns.tolist()
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        metric_col = st.selectbox("Metric", options=metric_columns, key="trend_metric")
+    with col2:
+        min_tests = st.number_input("Minimum tests", min_value=MIN_TREND_TESTS, max_value=50, value=MIN_TREND_TESTS,
+                                    key="trend_min_tests")
+    with col3:
+        declining_only = st.toggle("Trending down only", value=True, key="trend_declining")
+
+    trends = timer.run(
+        'trends', metric_trends_cached,
+        rows_key, athlete_id_column, position_column, metric_col, display_date_column, analysis_data
+    )
+    trend_col = f'Trend per {TREND_PERIOD_DAYS} Days'
+    trends = trends[trends['Tests'] >= min_tests]
+    if declining_only:
+        trends = trends[trends[trend_col] < 0]
+    st.dataframe(trends.sort_values(trend_col, kind='stable'), width="stretch", hide_index=True)
+    st.caption(f"{len(trends)} athletes. Trend is the least-squares slope of {metric_col} over the athlete's tests, "
+               f"per {TREND_PERIOD_DAYS} days; Latest % of Best compares the latest test with the athlete's highest. "
+               "For metrics where lower is better (e.g. contraction time), a negative trend is an improvement.")
+
+@st.fragment
+def show_distributions(rows_key, position_column, metric_columns, positions, normative_dfs, individual_df,
+                       analysis_data, timer):
+    """Distribution charts of a metric per position, with an optional athlete marker
+
+    Charts are drawn from the cached histograms and the normative tables, so
+    the browser gets a bounded payload instead of the analyzed rows. A
+    fragment: changing the selections reruns only this section.
+    """
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        metric_col = st.selectbox("Metric", options=metric_columns, key="distribution_metric")
+    with col2:
+        chart_position = st.selectbox("Histogram position", options=[str(position) for position in positions] + ['ALL POSITIONS'],
+                                      key="distribution_position")
+    with col3:
+        athlete = st.selectbox("Mark athlete", options=['None'] + sorted(individual_df['Athlete'].unique()),
+                               key="distribution_athlete", help="Marks the athlete's most recent test")
+
+    histograms = timer.run('histograms', metric_histograms_cached, rows_key, position_column, metric_col, analysis_data)
+    athlete_name = athlete_position = athlete_value = None
+    latest = athlete_latest_value(individual_df, athlete, metric_col) if athlete != 'None' else None
+    if latest is not None:
+        athlete_name = athlete
+        athlete_position, athlete_value = str(latest[0]), latest[1]
+
+    # The athlete's value is only marked on a histogram that includes their tests
+    marked_value = athlete_value if chart_position in (athlete_position, 'ALL POSITIONS') else None
+    with timer.stage('distribution_charts'):
+        st.altair_chart(
+            histogram_chart(histograms, chart_position, metric_col, athlete_name, marked_value),
+            width="stretch"
+        )
+        box_tab, violin_tab = st.tabs(["Box Plot", "Violin Plot"])
+        with box_tab:
+            st.altair_chart(
+                box_chart(normative_dfs[metric_col], metric_col, athlete_name, athlete_value, athlete_position),
+                width="stretch"
+            )
+            st.caption("Whiskers span Min to Max, the box P25 to P75 with a tick at the median; "
+                       "the dot is P90.")
+        with violin_tab:
+            st.altair_chart(violin_chart(histograms, metric_col))
+            st.caption("Violin widths are each position's share of tests per histogram bin.")
+
+def show_diagnostics(timer):
+    """Diagnostics expander: this run's stage timings, their JSON export and an optional profile"""
+    # A profiling rerun profiles the stage that was slowest in this run
+    st.session_state['diagnostics_slowest_stage'] = timer.slowest()
+    with st.expander("Diagnostics"):
+        st.caption("Wall time and peak memory of each pipeline stage in this run. Stages served from the "
+                   "cache take almost no time on reruns. Exports are timed when they are downloaded.")
+        st.dataframe(timer.to_frame(), width="stretch", hide_index=True)
+        st.caption(f"Total: {timer.total_seconds():.3f} s")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.checkbox(
+                "Trace peak memory per stage",
+                key='diagnostics_trace_memory',
+                help="Uses tracemalloc, which makes allocation-heavy stages several times slower"
+            )
+        with col2:
+            st.checkbox(
+                "Profile the slowest stage",
+                key='diagnostics_profile',
+                help="Runs the slowest stage of the previous run under cProfile"
+            )
+        st.download_button(
+            label="Download Stage Timings (JSON)",
+            data=lambda: timer.to_json(),
+            file_name="cmj_stage_timings.json",
+            mime="application/json",
+            on_click="ignore"
+        )
+        if timer.profile is not None:
+            st.caption(f"cProfile of stage '{timer.profile_stage}', by cumulative time")
+            st.code(timer.profile, language=None)
+
+# Wall time of every pipeline stage in this run, for the Diagnostics panel.
+# Memory tracing and profiling are switched on there and apply from the next run.
+stage_timer = StageTimer(
+    trace_memory=st.session_state.get('diagnostics_trace_memory', False),
+    profile_stage=st.session_state.get('diagnostics_slowest_stage')
+    if st.session_state.get('diagnostics_profile', False) else None
+)
 
 # Main application logic
-if cmj_file is not None and roster_file is not None:
+if (cmj_files or use_history) and roster_file is not None:
     
     # Load data
-    cmj_data = load_data(cmj_file)
-    roster_data = load_data(roster_file)
+    with stage_timer.stage('load_roster'):
+        roster_digest = file_digest(roster_file)
+        roster_data = load_data_cached(roster_digest, roster_file.name, roster_file)
+        # Split "First Name"/"Last Name" columns are combined into one "Full Name"
+        roster_data, roster_names_combined = combine_name_columns(roster_data)
+    if roster_names_combined:
+        st.success(f"Combined roster names into '{FULL_NAME_COLUMN}' column")
+
+    cmj_sniffed = False
+    with stage_timer.stage('load_cmj'):
+        if use_history:
+            if use_streaming:
+                st.warning("Streaming mode is not available with the test history; reading the saved history in full")
+                use_streaming = False
+            appended_digests = st.session_state.setdefault('history_appended_digests', set())
+            history_rows_added = st.session_state.setdefault('history_rows_added', {})
+            try:
+                for cmj_file in cmj_files:
+                    upload_digest = file_digest(cmj_file)
+                    # Append each upload once; reruns reuse the stored result
+                    if upload_digest not in appended_digests:
+                        # The store parses test dates itself, so append the file as read
+                        cmj_file.seek(0)
+                        upload_data = load_data(cmj_file)
+                        upload_date_cols = [col for col in upload_data.columns if 'date' in col.lower()]
+                        history_rows_added[upload_digest] = append_to_history(
+                            upload_data,
+                            date_column=upload_date_cols[0] if upload_date_cols else None
+                        )
+                        appended_digests.add(upload_digest)
+                    st.caption(f"Added {history_rows_added[upload_digest]} new tests from {cmj_file.name} to the test history")
+
+                store_version = history_version()
+                # Like an upload, the history is configured from a sample and read once the columns are known
+                cmj_data, history_tests = sample_history_cached(store_version)
+            except ValueError as e:
+                st.error(f"Could not use the test history: {e}")
+                st.stop()
+            # Downstream caches key on the store contents instead of a single upload
+            cmj_digest = hashlib.sha256(repr(store_version).encode()).hexdigest()
+            if cmj_data is None:
+                st.info("The test history is empty. Upload a CMJ export to start it.")
+            else:
+                st.caption(f"Test history: {history_tests} tests in {len(store_version)} saved uploads")
+        else:
+            if use_streaming and len(cmj_files) > 1:
+                st.warning("Streaming mode reads a single CSV file; loading the uploaded files in full")
+                use_streaming = False
+            elif use_streaming and not cmj_files[0].name.endswith('.csv'):
+                st.warning("Streaming mode only supports CSV files; loading the Excel file in full")
+                use_streaming = False
+            # Only a sample is loaded up front: the configuration below needs just
+            # column names and types. Norms stream the full file later in streaming
+            # mode; otherwise the selected columns are loaded once they are known.
+            cmj_digests = [file_digest(cmj_file) for cmj_file in cmj_files]
+            cmj_samples = [
+                sniff_cmj_cached(digest, cmj_file.name, cmj_file) for digest, cmj_file in zip(cmj_digests, cmj_files)
+            ]
+            cmj_data = cmj_samples[0] if len(cmj_samples) == 1 else pd.concat(cmj_samples, ignore_index=True)
+            # One upload keeps its own digest; several are identified by theirs in upload order
+            cmj_digest = (cmj_digests[0] if len(cmj_digests) == 1
+                          else hashlib.sha256(''.join(cmj_digests).encode()).hexdigest())
+            cmj_sniffed = not use_streaming
     
     if cmj_data is not None and roster_data is not None:
 
+        if FULL_NAME_COLUMN in cmj_data.columns and detect_name_columns(cmj_data):
+            st.success(f"Combined CMJ names into '{FULL_NAME_COLUMN}' column")
+
         st.markdown("---")
 
         # Configuration options - Auto-detect with manual override option
         st.header("Configuration")
 
-        # Get column suggestions
-        cmj_numeric_cols = get_numeric_columns(cmj_data)
-        cmj_text_cols = get_text_columns(cmj_data)
-        roster_text_cols = get_text_columns(roster_data)
-
-        # AUTO-DETECT ATHLETE ID COLUMN
-        # Find common columns between datasets - this is almost always the athlete ID
-        common_cols = list(set(cmj_data.columns) & set(roster_data.columns))
-        auto_athlete_col = common_cols[0] if common_cols else (cmj_text_cols[0] if cmj_text_cols else cmj_data.columns[0])
-
-        # AUTO-DETECT POSITION COLUMN
-        # Look for columns with "position" in the name
-        position_candidates = [col for col in roster_data.columns if 'position' in col.lower()]
-        auto_position_col = position_candidates[0] if position_candidates else (roster_text_cols[1] if len(roster_text_cols) > 1 else (roster_text_cols[0] if roster_text_cols else roster_data.columns[-1]))
+        # AUTO-DETECT ATHLETE ID AND POSITION COLUMNS
+        auto_athlete_col = detect_athlete_column(cmj_data, roster_data)
+        auto_position_col = detect_position_column(roster_data)
 
         # Default athlete ID and position (can be overridden in advanced settings)
         athlete_id_column = auto_athlete_col
         position_column = auto_position_col
 
         # METRIC SELECTION - This is the main user choice
-        # Filter to only numeric columns for metric selection
-        metric_options = cmj_numeric_cols if cmj_numeric_cols else cmj_data.columns.tolist()
-
-        # Default to first 3 numeric columns (or fewer if less available)
-        default_metrics = metric_options[:min(3, len(metric_options))]
+        # Numeric columns are offered; the first 3 are selected by default
+        metric_options, default_metrics = default_metric_columns(cmj_data)
 
         metric_columns = st.multiselect(
             "Select Performance Metrics (3-4 recommended)",
@@ -216,21 +641,64 @@ if cmj_file is not None and roster_file is not None:
                     key="advanced_position"
                 )
 
+            match_names = st.checkbox(
+                "Match names that differ in case, spacing, punctuation, suffixes or small typos",
+                value=not use_streaming,
+                disabled=use_streaming,
+                help="Names not found exactly in the roster are matched by a normalized form, then by similarity. "
+                     "Streaming mode matches exact names only."
+            )
+
+        # A roster with split names matches on its combined full name
+        roster_data = roster_with_athlete_column(roster_data, athlete_id_column)
+
         # Show what columns are being used (after advanced settings so overrides are reflected)
         metrics_display = ", ".join(metric_columns) if metric_columns else "None selected"
         st.info(f"**Using:** Athlete ID: {athlete_id_column} | Position: {position_column} | Metrics: {metrics_display}")
 
         # Date column selection for filtering
         # Try to detect date columns
-        potential_date_cols = [col for col in cmj_data.columns if any(word in col.lower() for word in ['date', 'time', 'year'])]
+        potential_date_cols = detect_date_columns(cmj_data)
 
         # Auto-select first date column for display (always show in individual results)
         display_date_column = potential_date_cols[0] if potential_date_cols else None
 
+        # Everything above ran on the sniffed sample; read only the columns the analysis uses
+        cmj_columns = None
+        cmj_identity = None
+        if cmj_sniffed or use_history:
+            cmj_columns = tuple(source_columns(cmj_data, [
+                athlete_id_column, *metric_columns, *potential_date_cols, TEST_TYPE_COLUMN,
+                *(detect_name_columns(cmj_data) or ())
+            ]))
+        if cmj_sniffed:
+            cmj_identity = (athlete_id_column, display_date_column)
+            cmj_data, cmj_loaded_bytes, upload_report = stage_timer.run(
+                'load_cmj_columns', load_cmj_cached,
+                cmj_digest, tuple(cmj_file.name for cmj_file in cmj_files), cmj_columns, cmj_identity, cmj_files
+            )
+            if len(cmj_files) > 1:
+                duplicates_dropped = upload_report['Duplicates Dropped'].sum()
+                with st.expander(
+                    f"Combined {len(cmj_files)} files: {len(cmj_data)} tests, "
+                    f"{duplicates_dropped} duplicate tests dropped"
+                ):
+                    st.caption("A test is a duplicate when a test with the same athlete, date and time, test type "
+                               "and values in every numeric column came from an earlier file in the upload order.")
+                    st.dataframe(upload_report, width="stretch", hide_index=True)
+        # Identifies the file content, the columns loaded from it and how repeated tests were found
+        cmj_data_key = (cmj_digest, cmj_columns, cmj_identity)
+
         use_date_filter = False
         date_column = None
-        filtered_cmj_data = cmj_data.copy()
+        filtered_cmj_data = cmj_data
         date_filter_info = ""
+        # Identifies the active date filter in the merge cache key
+        date_filter_key = None
+        # The history filters on the dates it stored: those of the first date column, times included
+        date_filter_columns = potential_date_cols
+        if use_history:
+            date_filter_columns = [col for col in cmj_data.columns if 'date' in col.lower()][:1]
 
         with st.expander("Date Filtering (Optional)"):
             st.caption("Filter data by specific date range or year")
@@ -241,20 +709,42 @@ if cmj_file is not None and roster_file is not None:
                 help="Enable to filter data by specific date range or year"
             )
 
-            if use_date_filter and potential_date_cols:
+            if use_date_filter and use_streaming:
+                st.warning("Date filtering is not available in streaming mode")
+                use_date_filter = False
+
+            if use_date_filter and date_filter_columns:
                 date_column = st.selectbox(
                     "Date Column",
-                    options=potential_date_cols,
+                    options=date_filter_columns,
                     help="Select the column containing test dates"
                 )
 
-                # Try to convert to datetime
+                # Combine with a separate time column (e.g. "4:42 PM") when there is one
+                time_column = None if use_history else detect_time_column(cmj_data, date_column)
+                if time_column:
+                    st.caption(f"Test times from '{time_column}' are combined with '{date_column}'")
+
+                # Try to convert to datetime; the data is kept sorted by test time so
+                # both filters below are binary-search slices
                 try:
-                    filtered_cmj_data[date_column] = pd.to_datetime(filtered_cmj_data[date_column])
+                    if use_history:
+                        dated_cmj_data = stage_timer.run(
+                            'date_parse', index_history_dates_cached, store_version, date_column
+                        )
+                    else:
+                        dated_cmj_data = stage_timer.run(
+                            'date_parse', index_dates_cached, cmj_data_key, date_column, time_column, cmj_data
+                        )
+                    if dated_cmj_data.n_dated == 0:
+                        raise ValueError("no values could be read as dates")
+                    if dated_cmj_data.n_unparsed:
+                        st.warning(f"{dated_cmj_data.n_unparsed} tests have a '{date_column}' value that could not "
+                                   "be read as a date; they are left out of the date filter")
 
                     # Get min and max dates
-                    min_date = filtered_cmj_data[date_column].min()
-                    max_date = filtered_cmj_data[date_column].max()
+                    min_date = dated_cmj_data.min_date.date()
+                    max_date = dated_cmj_data.max_date.date()
 
                     # Filter type selection
                     filter_type = st.radio(
@@ -264,9 +754,7 @@ if cmj_file is not None and roster_file is not None:
                     )
 
                     if filter_type == "Year":
-                        # Extract years
-                        filtered_cmj_data['Year'] = filtered_cmj_data[date_column].dt.year
-                        available_years = sorted(filtered_cmj_data['Year'].dropna().unique())
+                        available_years = dated_cmj_data.available_years()
 
                         selected_years = st.multiselect(
                             "Select Year(s)",
@@ -276,8 +764,9 @@ if cmj_file is not None and roster_file is not None:
                         )
 
                         if selected_years:
-                            filtered_cmj_data = filtered_cmj_data[filtered_cmj_data['Year'].isin(selected_years)]
+                            filtered_cmj_data = stage_timer.run('date_filter', dated_cmj_data.years, selected_years)
                             date_filter_info = f"Filtered to: {', '.join(map(str, selected_years))}"
+                            date_filter_key = (date_column, 'Year', tuple(selected_years))
                         else:
                             st.warning("Please select at least one year")
                             use_date_filter = False
@@ -300,23 +789,72 @@ if cmj_file is not None and roster_file is not None:
                             )
 
                         # Filter by date range
-                        filtered_cmj_data = filtered_cmj_data[
-                            (filtered_cmj_data[date_column] >= pd.to_datetime(start_date)) &
-                            (filtered_cmj_data[date_column] <= pd.to_datetime(end_date))
-                        ]
+                        filtered_cmj_data = stage_timer.run(
+                            'date_filter', dated_cmj_data.date_range, start_date, end_date
+                        )
                         date_filter_info = f"Filtered to: {start_date} to {end_date}"
+                        date_filter_key = (date_column, 'Date Range', start_date, end_date)
 
                 except Exception as e:
                     st.error(f"Could not parse dates in column '{date_column}': {str(e)}")
                     use_date_filter = False
 
-            elif use_date_filter and not potential_date_cols:
+            elif use_date_filter and not date_filter_columns:
                 st.warning("No date columns detected in CMJ data")
                 use_date_filter = False
         
+        if use_history:
+            cmj_data, cmj_loaded_bytes = stage_timer.run(
+                'load_history_columns', read_history_cached,
+                store_version, cmj_columns, date_filter_key if use_date_filter else None
+            )
+            filtered_cmj_data = cmj_data
+
         # Use filtered data for analysis
         cmj_data_for_analysis = filtered_cmj_data if use_date_filter else cmj_data
 
+        with st.expander("Session Aggregation (Optional)"):
+            st.caption("Athletes who test several times a day otherwise count once per test in the norms and rankings")
+            session_method = st.selectbox(
+                "Combine each athlete's tests on the same day into",
+                options=[None] + list(SESSION_AGGREGATIONS),
+                format_func=lambda method: "Every test (no aggregation)" if method is None else SESSION_AGGREGATIONS[method],
+                disabled=use_streaming or display_date_column is None,
+                help="One row per athlete per test day, combined per metric. Highest is the largest value, "
+                     "also for metrics where lower is better. Other columns keep the day's first test."
+            )
+            if display_date_column is None:
+                st.caption("Needs a date column in the CMJ data")
+            elif use_streaming:
+                st.caption("Not available in streaming mode")
+        if use_streaming or display_date_column is None:
+            session_method = None
+
+        # Optional screening of mis-trials against each position's median and MAD
+        screening = None
+        with st.expander("Data Quality Screening (Optional)"):
+            st.caption("Find tests far from their position's typical values, such as a 0 cm jump or a "
+                       "mis-recorded countermovement depth, before they reach the norms")
+            use_screening = st.checkbox("Screen tests for outliers", value=False, disabled=use_streaming)
+            col1, col2 = st.columns(2)
+            with col1:
+                screening_action = st.selectbox(
+                    "Tests that fail screening",
+                    options=list(SCREENING_ACTIONS),
+                    format_func=SCREENING_ACTIONS.get
+                )
+            with col2:
+                screening_threshold = st.number_input(
+                    "Robust z-score limit", min_value=2.0, max_value=10.0, value=SCREENING_Z_THRESHOLD, step=0.5,
+                    help="Distance from the position's median in robust SDs (scaled MAD). "
+                         f"Positions with fewer than {SCREENING_MIN_TESTS} tests of a metric are not screened on it."
+                )
+            screening_zeros = st.checkbox("Also fail tests with a metric value of exactly 0", value=True)
+            if use_streaming:
+                st.caption("Not available in streaming mode")
+            elif use_screening:
+                screening = (screening_action, float(screening_threshold), screening_zeros)
+
         st.markdown("---")
 
         # Display data preview
@@ -327,10 +865,21 @@ if cmj_file is not None and roster_file is not None:
             st.subheader("CMJ Data Preview")
             if use_date_filter:
                 st.info(date_filter_info)
-            st.dataframe(cmj_data_for_analysis.head(), width="stretch")
-            st.caption(f"Total rows: {len(cmj_data_for_analysis)}")
+            st.dataframe(cmj_data_for_analysis.head().apply(restore_float64), width="stretch")
+            if use_streaming:
+                st.caption(f"Streaming mode: configured from the first {len(cmj_data)} rows; the full file is read in chunks")
+            else:
+                st.caption(f"Total rows: {len(cmj_data_for_analysis)}")
             if use_date_filter:
-                st.caption(f"(Filtered from {len(cmj_data)} total records)")
+                st.caption(f"(Filtered from {history_tests if use_history else len(cmj_data)} total records)")
+            if not use_streaming:
+                # Text stored as categoricals and metrics as float32 where no value changes
+                cmj_memory_bytes = memory_footprint(cmj_data)
+                st.caption(
+                    f"Memory: {cmj_memory_bytes / 1e6:.1f} MB in the compact schema "
+                    f"(was {cmj_loaded_bytes / 1e6:.1f} MB as loaded, "
+                    f"{1 - cmj_memory_bytes / cmj_loaded_bytes:.0%} smaller)"
+                )
             st.caption(f"Columns: {', '.join(cmj_data_for_analysis.columns.tolist())}")
         
         with col2:
@@ -346,168 +895,178 @@ if cmj_file is not None and roster_file is not None:
             st.info("Please select at least one performance metric to analyze")
             st.stop()
 
-        # Check if required columns exist
-        if athlete_id_column not in cmj_data.columns:
-            st.error(f"Column '{athlete_id_column}' not found in CMJ data")
-            st.stop()
-
-        for metric_col in metric_columns:
-            if metric_col not in cmj_data.columns:
-                st.error(f"Column '{metric_col}' not found in CMJ data")
-                st.stop()
-
-        if athlete_id_column not in roster_data.columns:
-            st.error(f"Column '{athlete_id_column}' not found in Roster data")
+        # Check that the required columns exist and metrics are numeric
+        column_errors = validate_columns(cmj_data, roster_data, athlete_id_column, position_column, metric_columns)
+        if column_errors:
+            st.error(column_errors[0])
             st.stop()
-
-        if position_column not in roster_data.columns:
-            st.error(f"Column '{position_column}' not found in Roster data")
-            st.stop()
-
-        # Check if metric columns are numeric
-        for metric_col in metric_columns:
-            if not pd.api.types.is_numeric_dtype(cmj_data[metric_col]):
-                st.error(f"Column '{metric_col}' must contain numeric values")
-                st.info(f"Current data type: {cmj_data[metric_col].dtype}")
-                st.stop()
         
-        # Merge datasets
-        merged_data = pd.merge(
-            cmj_data_for_analysis, 
-            roster_data[[athlete_id_column, position_column]], 
-            on=athlete_id_column, 
-            how='left'
-        )
+        if use_streaming:
+            # Norms come straight from the chunked file; no full merged frame is built
+            streaming_key = (cmj_digest, roster_digest)
+            normative_dfs, norms_rank_error = stage_timer.run(
+                'streaming_norms',
+                stream_position_norms_cached,
+                streaming_key,
+                athlete_id_column,
+                position_column,
+                metric_columns,
+                cmj_files[0],
+                roster_data
+            )
+            positions = normative_dfs[metric_columns[0]]['Position'].iloc[:-1].tolist()
+            analysis_key = (streaming_key, athlete_id_column, position_column, tuple(metric_columns))
+            # Streamed norms are computed for the metric set together
+            norms_key = analysis_key
+        else:
+            # Combine repeated tests before the merge so everything after runs on one row per session
+            tests_before_sessions = len(cmj_data_for_analysis)
+            session_key = None
+            if session_method:
+                session_key = (session_method, tuple(metric_columns))
+                cmj_data_for_analysis = stage_timer.run(
+                    'session_aggregation',
+                    aggregate_sessions_cached,
+                    (cmj_data_key, date_filter_key if use_date_filter else None),
+                    athlete_id_column,
+                    display_date_column,
+                    tuple(metric_columns),
+                    session_method,
+                    cmj_data_for_analysis
+                )
+
+            # Merge datasets
+            merge_key = (cmj_digest, roster_digest, date_filter_key if use_date_filter else None, session_key)
+            merged_data, name_matches = stage_timer.run(
+                'merge',
+                merge_roster_cached,
+                (merge_key, cmj_columns, cmj_identity),
+                athlete_id_column,
+                position_column,
+                match_names,
+                cmj_data_for_analysis,
+                roster_data
+            )
+            analysis_key = (merge_key, athlete_id_column, position_column, match_names, tuple(metric_columns))
+
+            # Report names that only matched after normalizing or by similarity
+            if name_matches is not None:
+                match_counts = name_matches['Match'].value_counts()
+                loose_matches = name_matches[name_matches['Match'] != 'exact']
+                if len(loose_matches) > 0:
+                    with st.expander(
+                        f"Name matching: {match_counts.get('exact', 0)} exact, "
+                        f"{match_counts.get('normalized', 0)} normalized, {match_counts.get('fuzzy', 0)} fuzzy, "
+                        f"{match_counts.get('ambiguous', 0)} ambiguous, {match_counts.get('unmatched', 0)} unmatched"
+                    ):
+                        st.caption("Confidence is the name similarity (1 = same name after normalizing). "
+                                   "Check fuzzy matches before relying on them. Ambiguous names are about as "
+                                   "close to two roster names and are left unmatched.")
+                        st.dataframe(
+                            loose_matches.sort_values(['Match', 'Confidence']),
+                            width="stretch",
+                            hide_index=True
+                        )
         
-        # Check for athletes without position
-        no_position = merged_data[merged_data[position_column].isna()]
-        if len(no_position) > 0:
-            st.warning(f"{len(no_position)} athletes found in CMJ data without position information")
-            with st.expander("View athletes without position"):
-                st.dataframe(no_position[[athlete_id_column]], width="stretch")
+            # Check for athletes without position
+            no_position = merged_data[merged_data[position_column].isna()]
+            if len(no_position) > 0:
+                st.warning(f"{len(no_position)} athletes found in CMJ data without position information")
+                with st.expander("View athletes without position"):
+                    st.dataframe(no_position[[athlete_id_column]], width="stretch")
         
-        # Remove rows without position or any of the selected metrics
-        columns_to_check = [position_column] + metric_columns
-        analysis_data = merged_data.dropna(subset=columns_to_check)
-
-        # Check if we have any data left to analyze
-        if len(analysis_data) == 0:
-            st.error("No valid data to analyze after removing rows with missing position or metric values.")
-            st.info("Please check that:")
-            st.markdown("- Athletes in CMJ data match athletes in roster")
-            st.markdown("- Position column has values")
-            st.markdown("- Metric columns have numeric values")
-            st.stop()
+            # Remove rows without position or any of the selected metrics
+            analysis_data = stage_timer.run('select_rows', select_analysis_rows, merged_data, position_column, metric_columns)
+
+            # Check if we have any data left to analyze
+            if len(analysis_data) == 0:
+                st.error("No valid data to analyze after removing rows with missing position or metric values.")
+                st.info("Please check that:")
+                st.markdown("- Athletes in CMJ data match athletes in roster")
+                st.markdown("- Position column has values")
+                st.markdown("- Metric columns have numeric values")
+                st.stop()
 
-        st.success(f"Successfully merged data: {len(analysis_data)} records ready for analysis")
+            if screening is not None:
+                screening_action, screening_threshold, screening_zeros = screening
+                screening_reasons = stage_timer.run(
+                    'screening', screen_tests,
+                    analysis_data, position_column, metric_columns, screening_threshold, screening_zeros
+                )
+                failed_report = screening_report(
+                    analysis_data, screening_reasons, athlete_id_column, position_column, metric_columns,
+                    display_date_column
+                )
+                verb = "excluded" if screening_action == 'exclude' else "flagged"
+                with st.expander(f"Data quality screening: {len(failed_report)} of {len(analysis_data)} tests {verb}"):
+                    st.dataframe(failed_report, width="stretch", hide_index=True)
+                if screening_action == 'exclude':
+                    analysis_data = analysis_data[(screening_reasons == '').to_numpy()]
+                    if len(analysis_data) == 0:
+                        st.error("Every test failed data quality screening. Raise the z-score limit or flag instead.")
+                        st.stop()
+
+            st.success(f"Successfully merged data: {len(analysis_data)} records ready for analysis")
+            # Per-metric results are keyed on the analyzed rows, not the metric set
+            rows_key = analysis_key[:-1] + (rows_digest(analysis_data),)
+            norms_key = rows_key
+            if session_method:
+                st.caption(
+                    f"{tests_before_sessions} tests combined into {len(cmj_data_for_analysis)} athlete sessions "
+                    f"({SESSION_AGGREGATIONS[session_method].lower()} per day)"
+                )
         
         # Calculate normative values by position for all selected metrics
         st.header("Normative Values by Position")
 
-        positions = sorted(analysis_data[position_column].unique())
-
-        # Function to apply color gradient based on percentile column level
-        def color_percentile_columns(df):
-            """Apply gold-to-green gradient to entire percentile columns (Baylor branding)"""
-            # Map column names to their percentile level (0-100 scale)
-            column_percentile_map = {
-                'P25': 25,
-                'P50 (Median)': 50,
-                'P75': 75,
-                'P90': 90,
-                'Mean': 50  # Mean typically around median
-            }
-
-            def get_color_for_percentile(percentile_level):
-                """Get RGB color for a given percentile level (0-100)
-                Baylor colors: Gold (#FFB81C) to Green (#003015)
-                """
-                # Normalize to 0-1
-                norm = percentile_level / 100.0
-
-                # Baylor Gold RGB: (255, 184, 28)
-                # Baylor Green RGB: (0, 48, 21)
-
-                # Create gradient: gold (low percentile) -> green (high percentile)
-                r = int(255 * (1 - norm))
-                g = int(184 - (184 - 48) * norm)
-                b = int(28 - (28 - 21) * norm)
-
-                # Text color: white for dark backgrounds
-                text_color = 'white' if norm > 0.5 else 'black'
-
-                return f'background-color: rgb({r},{g},{b}); color: {text_color}; font-weight: bold;'
-
-            styles = pd.DataFrame('', index=df.index, columns=df.columns)
-
-            # Apply color to entire columns based on percentile level
-            for col_name, percentile_level in column_percentile_map.items():
-                if col_name in df.columns:
-                    color = get_color_for_percentile(percentile_level)
-                    # Apply same color to all cells in this column
-                    styles[col_name] = [color] * len(df)
-
-            return styles
-
-        # Calculate normative values for each metric
-        normative_dfs = {}
-        for metric_col in metric_columns:
-            normative_results = []
-
-            for position in positions:
-                position_data = analysis_data[analysis_data[position_column] == position]
-                percentiles = calculate_percentiles(position_data, metric_col)
-
-                result_row = {
-                    'Position': position,
-                    'P25': round(percentiles['P25'], 2),
-                    'P50 (Median)': round(percentiles['P50'], 2),
-                    'P75': round(percentiles['P75'], 2),
-                    'P90': round(percentiles['P90'], 2),
-                    'Mean': round(percentiles['Mean'], 2),
-                    'SD': round(percentiles['SD'], 2),
-                    'Min': round(percentiles['Min'], 2),
-                    'Max': round(percentiles['Max'], 2),
-                    'N': int(percentiles['N'])
+        if use_streaming:
+            st.info(
+                f"Streaming mode: percentiles are within {norms_rank_error * 100:.2f} percentile ranks "
+                "of the exact values (exact for groups of up to "
+                f"{SKETCH_LEVEL_SIZE} tests). Mean, SD, Min, Max and N are exact."
+            )
+        else:
+            positions = sorted(analysis_data[position_column].unique())
+
+        # Normative values per metric; only metrics not computed before for these rows do any work
+        show_cis = False
+        if not use_streaming:
+            with stage_timer.stage('norms'):
+                normative_dfs = {
+                    metric_col: metric_norms_cached(rows_key, position_column, metric_col, analysis_data)
+                    for metric_col in metric_columns
                 }
-                normative_results.append(result_row)
-
-            normative_df = pd.DataFrame(normative_results)
-
-            # Ensure column order is correct
-            column_order = ['Position', 'P25', 'P50 (Median)', 'P75', 'P90', 'Mean', 'SD', 'Min', 'Max', 'N']
-            normative_df = normative_df[column_order]
-
-            # Calculate overall normative values
-            overall_percentiles = calculate_percentiles(analysis_data, metric_col)
-            overall_row = {
-                'Position': 'ALL POSITIONS',
-                'P25': round(overall_percentiles['P25'], 2),
-                'P50 (Median)': round(overall_percentiles['P50'], 2),
-                'P75': round(overall_percentiles['P75'], 2),
-                'P90': round(overall_percentiles['P90'], 2),
-                'Mean': round(overall_percentiles['Mean'], 2),
-                'SD': round(overall_percentiles['SD'], 2),
-                'Min': round(overall_percentiles['Min'], 2),
-                'Max': round(overall_percentiles['Max'], 2),
-                'N': int(overall_percentiles['N'])
-            }
-            normative_df = pd.concat([normative_df, pd.DataFrame([overall_row])], ignore_index=True)
-
-            normative_dfs[metric_col] = normative_df
+
+            # Intervals show how much a small position's percentiles could move with other tests
+            show_cis = st.checkbox(
+                f"Show {BOOTSTRAP_CONFIDENCE:.0%} bootstrap confidence intervals for percentiles",
+                value=False,
+                help=f"{BOOTSTRAP_REPLICATES} resamples per position and metric with a fixed seed, "
+                     "so the intervals are the same on every run"
+            )
+            if show_cis:
+                with stage_timer.stage('bootstrap_cis'):
+                    cis = {
+                        metric_col: metric_cis_cached(rows_key, position_column, metric_col, analysis_data)
+                        for metric_col in metric_columns
+                    }
+                normative_dfs = add_confidence_intervals(normative_dfs, cis)
 
         # Display normative tables in tabs
         if len(metric_columns) == 1:
             # Single metric - no tabs needed
-            styled_df = normative_dfs[metric_columns[0]].style.apply(color_percentile_columns, axis=None)
-            st.dataframe(styled_df, width="stretch", height=400, use_container_width=True)
+            with stage_timer.stage('normative_styling'):
+                styled_df = style_normative_table(normative_dfs[metric_columns[0]])
+                st.dataframe(styled_df, width="stretch", height=400, use_container_width=True)
 
             # Download button for single metric
-            csv_norm = normative_dfs[metric_columns[0]].to_csv(index=False).encode('utf-8')
+            csv_norm = stage_timer.run(
+                'csv_export', to_csv_cached, (norms_key, show_cis, metric_columns[0]), normative_dfs[metric_columns[0]]
+            )
             st.download_button(
                 label=f"Download {metric_columns[0]} Normative Values (CSV)",
                 data=csv_norm,
-                file_name=f"normative_values_{metric_columns[0]}.csv",
+                file_name=normative_csv_name(metric_columns[0]),
                 mime="text/csv"
             )
         else:
@@ -515,156 +1074,118 @@ if cmj_file is not None and roster_file is not None:
             tabs = st.tabs(metric_columns)
             for i, metric_col in enumerate(metric_columns):
                 with tabs[i]:
-                    styled_df = normative_dfs[metric_col].style.apply(color_percentile_columns, axis=None)
-                    st.dataframe(styled_df, width="stretch", height=400, use_container_width=True)
+                    with stage_timer.stage('normative_styling'):
+                        styled_df = style_normative_table(normative_dfs[metric_col])
+                        st.dataframe(styled_df, width="stretch", height=400, use_container_width=True)
 
                     # Download button for each metric
-                    csv_norm = normative_dfs[metric_col].to_csv(index=False).encode('utf-8')
+                    csv_norm = stage_timer.run(
+                        'csv_export', to_csv_cached, (norms_key, show_cis, metric_col), normative_dfs[metric_col]
+                    )
                     st.download_button(
                         label=f"Download {metric_col} Normative Values (CSV)",
                         data=csv_norm,
-                        file_name=f"normative_values_{metric_col}.csv",
+                        file_name=normative_csv_name(metric_col),
                         mime="text/csv",
                         key=f"download_norm_{i}"
                     )
 
         st.markdown("---")
 
+        if use_streaming:
+            st.info("Individual results and exports need the full dataset in memory; turn off streaming mode to see them.")
+            show_diagnostics(stage_timer)
+            st.stop()
+
         # Individual athlete analysis
         st.header("Individual Athlete Performance")
 
         if use_date_filter:
             st.info(f"{date_filter_info} | Showing {len(analysis_data)} test records")
 
-        # Add percentile ranks to merged data
-        def calculate_percentile_rank(value, position_data, metric_col):
-            """Calculate what percentile an individual value falls into"""
-            if pd.isna(value):
-                return None
-            position_values = position_data[metric_col].dropna().values
-            if len(position_values) == 0:
-                return None
-            percentile = (position_values < value).sum() / len(position_values) * 100
-            return round(percentile, 2)
-
-        # Color function for individual percentile ranks
-        def color_individual_percentiles(df):
-            """Apply gold-to-green gradient to percentile rank columns (Baylor branding)"""
-            styles = pd.DataFrame('', index=df.index, columns=df.columns)
-
-            percentile_rank_cols = [col for col in df.columns if 'Percentile' in col]
-
-            for col in percentile_rank_cols:
-                def percentile_to_color(val):
-                    if pd.isna(val) or not isinstance(val, (int, float)):
-                        return ''
-                    # Normalize to 0-1 (percentile is already 0-100)
-                    norm = val / 100.0
-
-                    # Baylor Gold RGB: (255, 184, 28)
-                    # Baylor Green RGB: (0, 48, 21)
-                    # Create gradient: gold (low) -> green (high)
-                    r = int(255 * (1 - norm))
-                    g = int(184 - (184 - 48) * norm)
-                    b = int(28 - (28 - 21) * norm)
-
-                    # Text color: white for dark backgrounds (higher percentiles)
-                    text_color = 'white' if norm > 0.5 else 'black'
-
-                    return f'background-color: rgb({r},{g},{b}); color: {text_color}; font-weight: bold;'
-
-                styles[col] = df[col].apply(percentile_to_color)
-
-            return styles
-
-        individual_results = []
-        for _, row in analysis_data.iterrows():
-            position_data = analysis_data[analysis_data[position_column] == row[position_column]]
-
-            result = {
-                'Athlete': row[athlete_id_column],
-                'Position': row[position_column],
-            }
-
-            # Always add test date if we have a date column
-            if display_date_column and display_date_column in row.index:
-                try:
-                    if pd.notna(row[display_date_column]):
-                        # Try to format as date
-                        date_val = pd.to_datetime(row[display_date_column])
-                        result['Test Date'] = date_val.strftime('%Y-%m-%d')
-                    else:
-                        result['Test Date'] = 'N/A'
-                except:
-                    # If conversion fails, show as string
-                    result['Test Date'] = str(row[display_date_column]) if pd.notna(row[display_date_column]) else 'N/A'
-
-            # Add each metric and its percentile rank (keep as floats for color styling)
-            for metric_col in metric_columns:
-                result[metric_col] = round(row[metric_col], 2) if pd.notna(row[metric_col]) else None
-                percentile_rank = calculate_percentile_rank(row[metric_col], position_data, metric_col)
-                result[f'{metric_col}_Percentile'] = percentile_rank
-
-            individual_results.append(result)
-
-        individual_df = pd.DataFrame(individual_results)
-
-        # Sort by first metric's percentile rank
-        first_metric_percentile = f'{metric_columns[0]}_Percentile'
-        if first_metric_percentile in individual_df.columns:
-            individual_df = individual_df.sort_values(first_metric_percentile, ascending=False)
-
-        # Function to format numbers without trailing zeros
-        def format_number(val):
-            """Format number to remove trailing zeros"""
-            if pd.isna(val) or not isinstance(val, (int, float)):
-                return val
-            # Format to 2 decimals, then remove trailing zeros and decimal point if needed
-            return f"{val:.2f}".rstrip('0').rstrip('.')
-
-        # Apply color styling and number formatting
-        styled_individual_df = individual_df.style.apply(color_individual_percentiles, axis=None)
-
-        # Format numeric columns (metrics and percentiles) to remove trailing zeros
-        numeric_cols = [col for col in individual_df.columns if col in metric_columns or 'Percentile' in col]
-        for col in numeric_cols:
-            styled_individual_df = styled_individual_df.format({col: format_number})
-
-        st.dataframe(styled_individual_df, width="stretch", height=400, use_container_width=True)
-        
+        # Optional rolling baselines: each test against recent tests instead of all of them
+        baselines = None
+        with st.expander("Rolling Baselines (Optional)"):
+            st.caption("Rank each test against the athlete's own previous tests and against the position's "
+                       f"recent tests. A baseline needs at least {MIN_BASELINE_TESTS} earlier tests.")
+            use_baselines = st.checkbox(
+                "Add rolling baseline percentiles",
+                value=False,
+                disabled=display_date_column is None,
+                help="Needs a test date column"
+            )
+            col1, col2 = st.columns(2)
+            with col1:
+                baseline_tests = st.number_input(
+                    "Athlete baseline: last N tests", min_value=MIN_BASELINE_TESTS, max_value=100,
+                    value=ATHLETE_BASELINE_TESTS
+                )
+            with col2:
+                baseline_days = st.number_input(
+                    "Position baseline: trailing days", min_value=7, max_value=730, value=POSITION_BASELINE_DAYS
+                )
+            if use_baselines and display_date_column is not None:
+                baselines = (int(baseline_tests), int(baseline_days))
+
+        individual_df = stage_timer.run(
+            'percentile_rank',
+            build_individual_results_cached,
+            rows_key, athlete_id_column, position_column, metric_columns, display_date_column,
+            baselines, analysis_data
+        )
+        # Flagged tests stay in the analysis; the results and raw export say why each was flagged
+        export_data = analysis_data
+        if screening is not None and screening[0] == 'flag':
+            individual_df = individual_df.assign(
+                **{SCREENING_REASON_COLUMN: screening_reasons.to_numpy()[individual_df.index]}
+            )
+            export_data = analysis_data.assign(**{SCREENING_REASON_COLUMN: screening_reasons})
+
+        show_results_page(individual_df, metric_columns, positions, stage_timer)
+
+        # Direction of each athlete's results over their tests
+        st.header("Athlete Trends")
+        if display_date_column is None:
+            st.info("Trends need a test date column in the CMJ data")
+        else:
+            show_trends(rows_key, athlete_id_column, position_column, metric_columns, display_date_column,
+                        analysis_data, stage_timer)
+
+        # Distribution charts
+        st.header("Distributions by Position")
+        show_distributions(rows_key, position_column, metric_columns, positions, normative_dfs, individual_df,
+                           analysis_data, stage_timer)
+
         # Export options
         st.header("Export Data")
 
+        # Files are only generated when a button is clicked, and then cached
+        # per analysis so repeated downloads and widget reruns are free
+        export_key = analysis_key + (screening, display_date_column, baselines, show_cis)
+
         col1, col2 = st.columns(2)
 
         with col1:
             # Export individual data as CSV
-            csv_individual = individual_df.to_csv(index=False).encode('utf-8')
             st.download_button(
                 label="Download Individual Results (CSV)",
-                data=csv_individual,
-                file_name="cmj_individual_results.csv",
-                mime="text/csv"
+                data=lambda: stage_timer.run('csv_export', to_csv_cached, (export_key, INDIVIDUAL_CSV_NAME), individual_df),
+                file_name=INDIVIDUAL_CSV_NAME,
+                mime="text/csv",
+                on_click="ignore"
             )
 
         with col2:
             # Export all data as Excel with multiple sheets
-            # Create Excel workbook with normative values for each metric
-            excel_sheets = {'Individual Results': individual_df, 'Raw Data': analysis_data}
-            # Add each metric's normative table as a separate sheet
-            for i, metric_col in enumerate(metric_columns, 1):
-                # Create short sheet name to fit within 31 char limit (including 'Norms_' prefix)
-                # Truncate metric name to fit: 'Norms_' (6 chars) + metric name (25 chars max)
-                short_name = metric_col[:25] if len(metric_col) > 25 else metric_col
-                sheet_name = f'Norms_{short_name}'
-                excel_sheets[sheet_name] = normative_dfs[metric_col]
-
-            excel_data = to_excel(excel_sheets)
+            # (individual results, raw data and normative values for each metric)
             st.download_button(
                 label="Download All Data (Excel)",
-                data=excel_data,
-                file_name="cmj_complete_analysis.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                data=lambda: stage_timer.run(
+                    'excel_export', build_excel_cached, export_key, individual_df, export_data, normative_dfs
+                ),
+                file_name=EXCEL_FILE_NAME,
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                on_click="ignore"
             )
 
         # Summary statistics
@@ -681,6 +1202,8 @@ if cmj_file is not None and roster_file is not None:
         with col3:
             st.metric("Metrics Analyzed", len(metric_columns))
 
+        show_diagnostics(stage_timer)
+
 else:
     # Instructions when no files uploaded
     st.info("Please upload both CMJ data and team roster files to begin analysis")
@@ -0,0 +1 @@
+"""Benchmarks for the cmj_norms pipeline on synthetic ForceDecks-shaped data"""
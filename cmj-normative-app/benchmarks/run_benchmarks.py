@@ -0,0 +1,163 @@
+"""Time each stage of the pipeline on synthetic data of increasing size
+
+    python -m benchmarks.run_benchmarks --rows 1000 --rows 100000 --output bench.json
+
+Stages mirror one full app run: sniff (header and first rows, to configure
+the analysis), ingestion (parse the CSV export), ingestion_columns (only the
+columns the analysis uses), compact_schema (categoricals and float32
+metrics), session_aggregation (mean of each athlete's highest 2 tests per
+day, not fed to later stages), merge (roster join), date_parse (Date + Time
+into sorted test timestamps), date_filter (middle half of the date range),
+screening (robust per-position outlier screening), norms
+(calculate_position_norms), percentile_rank (build_individual_results),
+rolling_baselines (last-10-tests and position 90-day ranks), styling (render
+one page of Individual Results), styling_full_table (the whole table, for
+reference) and excel_export (the complete analysis workbook). Each stage's
+best time over --repeat runs is written to a JSON file together with the
+environment, so results from different versions can be compared directly.
+Full-table styling and Excel export are skipped above their row limits
+(Excel sheets hold at most 1,048,576 rows).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cmj_norms.dates import DateIndexedData, parse_test_timestamps
+from cmj_norms.export import build_excel_sheets, to_excel
+from cmj_norms.ingest import compact_schema, load_data, sniff_data, source_columns
+from cmj_norms.longitudinal import calculate_rolling_percentiles
+from cmj_norms.norms import calculate_position_norms
+from cmj_norms.pipeline import build_individual_results, merge_roster, select_analysis_rows
+from cmj_norms.screening import screen_tests
+from cmj_norms.sessions import aggregate_sessions
+from cmj_norms.styling import style_results_page
+
+from .synthetic_data import write_dataset
+
+DEFAULT_ROWS = [1_000, 10_000, 100_000]
+DEFAULT_METRICS = ['Jump Height (Imp-Mom) in Inches [in]', 'Peak Power [W]', 'RSI-modified [m/s]']
+EXCEL_MAX_ROWS = 1_048_575
+DEFAULT_MAX_STYLE_ROWS = 200_000
+# Default Individual Results page size in the app
+RESULTS_PAGE_ROWS = 50
+
+def _best_time(func, repeat):
+    """Run func repeat times; return (best seconds, last result)"""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def benchmark_size(n_rows, data_dir, metrics, repeat=1, max_style_rows=DEFAULT_MAX_STYLE_ROWS):
+    """Time every stage for one dataset size; returns a list of result dicts"""
+    cmj_path, roster_path = write_dataset(n_rows, data_dir)
+    results = []
+
+    def record(stage, func, skip_reason=None):
+        if skip_reason:
+            results.append({'rows': n_rows, 'stage': stage, 'seconds': None, 'skipped': skip_reason})
+            return None
+        seconds, value = _best_time(func, repeat)
+        results.append({'rows': n_rows, 'stage': stage, 'seconds': round(seconds, 6)})
+        print(f"{n_rows:>10} rows  {stage:<16} {seconds:10.4f} s", flush=True)
+        return value
+
+    sample = record('sniff', lambda: sniff_data(cmj_path))
+    loaded_data = record('ingestion', lambda: load_data(cmj_path))
+    analysis_columns = source_columns(sample, ['Name', *metrics, 'Date', 'Time'])
+    record('ingestion_columns', lambda: load_data(cmj_path, usecols=analysis_columns))
+    cmj_data = record('compact_schema', lambda: compact_schema(loaded_data))
+    record('session_aggregation', lambda: aggregate_sessions(cmj_data, 'Name', 'Date', metrics, 'top2'))
+    roster_data = load_data(roster_path)
+    merged_data = record('merge', lambda: merge_roster(cmj_data, roster_data, 'Name', 'Position'))
+
+    dated_data = record('date_parse', lambda: DateIndexedData.build(merged_data, 'Date', 'Time'))
+    span = dated_data.max_date - dated_data.min_date
+    start, end = dated_data.min_date + span / 4, dated_data.max_date - span / 4
+    record('date_filter', lambda: dated_data.date_range(start, end))
+
+    analysis_data = select_analysis_rows(merged_data, 'Position', metrics)
+    record('screening', lambda: screen_tests(analysis_data, 'Position', metrics))
+    normative_dfs = record('norms', lambda: calculate_position_norms(analysis_data, 'Position', metrics))
+    individual_df = record('percentile_rank', lambda: build_individual_results(
+        analysis_data, 'Name', 'Position', metrics, 'Date'
+    ))
+    baseline_timestamps = parse_test_timestamps(analysis_data, 'Date', 'Time')
+    record('rolling_baselines', lambda: calculate_rolling_percentiles(
+        analysis_data, 'Name', 'Position', metrics, baseline_timestamps
+    ))
+
+    # The app styles one page of results; the full table is timed for reference
+    record('styling', lambda: style_results_page(individual_df.iloc[:RESULTS_PAGE_ROWS], metrics).to_html())
+    record(
+        'styling_full_table',
+        lambda: style_results_page(individual_df, metrics).to_html(),
+        None if n_rows <= max_style_rows else f'more than {max_style_rows} rows'
+    )
+    record(
+        'excel_export',
+        lambda: to_excel(build_excel_sheets(individual_df, analysis_data, normative_dfs)),
+        None if n_rows <= EXCEL_MAX_ROWS else 'exceeds the Excel sheet row limit'
+    )
+    return results
+
+def environment_info():
+    """Versions and hardware the results were measured on"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=Path(__file__).parent, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'git_commit': commit,
+        'python': sys.version.split()[0],
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': pd.Timestamp.now(tz='UTC').isoformat()
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark each pipeline stage on synthetic CMJ data")
+    parser.add_argument('--rows', type=int, action='append',
+                        help=f"CMJ rows to benchmark (1k-5M); repeatable (default: {DEFAULT_ROWS})")
+    parser.add_argument('--metric', action='append', help="Metric column to analyze; repeatable, or 'all'")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per stage; the best time is kept")
+    parser.add_argument('--max-style-rows', type=int, default=DEFAULT_MAX_STYLE_ROWS,
+                        help="Skip the styling stage above this many rows")
+    parser.add_argument('--data-dir', help="Where to write the synthetic files (default: a temporary folder)")
+    parser.add_argument('--output', default='benchmark_results.json', help="JSON results file")
+    args = parser.parse_args(argv)
+
+    if args.metric == ['all']:
+        from .synthetic_data import METRIC_SPECS
+        metrics = [column for column, *_ in METRIC_SPECS]
+    else:
+        metrics = args.metric or DEFAULT_METRICS
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_dir = args.data_dir or temp_dir
+        results = []
+        for n_rows in args.rows or DEFAULT_ROWS:
+            results.extend(benchmark_size(n_rows, data_dir, metrics, args.repeat, args.max_style_rows))
+
+    report = {'environment': environment_info(), 'metrics': metrics, 'repeat': args.repeat, 'results': results}
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Synthetic data shaped like the ForceDecks CMJ export and team roster
+
+generate_cmj_data produces the same 29 columns, dtypes and string formats as
+CMJ_Data_Cleaned.csv (MM/DD/YYYY dates, "4:42 PM" times, "9.4 L" asymmetry
+values); generate_roster produces a matching Roster_Cleaned.csv. Values are
+drawn around the real export's means and SDs with a per-athlete offset, so
+positions and athletes differ the way real data does. Everything is
+vectorized so millions of rows can be generated in seconds.
+
+    python -m benchmarks.synthetic_data --rows 100000 --output-dir /tmp/cmj
+"""
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Position mix of Roster_Cleaned.csv
+POSITION_WEIGHTS = {
+    'WR': 18, 'DL': 17, 'OL': 17, 'S': 16, 'CB': 10, 'LB': 8, 'RB': 7,
+    'TE': 6, 'OLB': 6, 'QB': 5, 'K': 3, 'LS': 2, 'P': 1
+}
+
+# (column, mean, sd, decimals) for numeric metrics, from CMJ_Data_Cleaned.csv;
+# decimals == 0 means the export stores the column as integers
+METRIC_SPECS = [
+    ('BW [KG]', 105.94, 21.49, 2),
+    ('RSI-modified [m/s]', 0.63, 0.14, 2),
+    ('Jump Height (Imp-Mom) in Inches [in]', 16.54, 3.16, 1),
+    ('Concentric Impulse [N s]', 298.27, 41.99, 1),
+    ('Contraction Time [ms]', 742.84, 84.12, 0),
+    ('Vertical Velocity at Takeoff [m/s]', 2.86, 0.28, 2),
+    ('Concentric Peak Force [N]', 2783.62, 513.82, 0),
+    ('Countermovement Depth [cm]', -36.93, 6.15, 1),
+    ('Eccentric Braking Impulse [N s]', 80.83, 21.80, 1),
+    ('Eccentric Deceleration Impulse [N s]', 155.71, 34.16, 1),
+    ('Eccentric Duration [ms]', 488.33, 62.26, 0),
+    ('Eccentric Peak Velocity [m/s]', -1.48, 0.23, 2),
+    ('Eccentric Peak Power [W]', 2352.70, 668.23, 0),
+    ('Eccentric Unloading Impulse [N s]', -155.71, 34.16, 1),
+    ('Flight Time:Contraction Time', 0.84, 0.13, 2),
+    ('Lower-Limb Stiffness [N/m]', 7307.01, 1500.0, 0),
+    ('P2 Concentric Impulse:P1 Concentric Impulse', 0.60, 0.13, 2),
+    ('Peak Power [W]', 6269.94, 862.44, 0),
+    ('Force at Zero Velocity [N]', 2647.24, 516.08, 0),
+]
+
+ASYMMETRY_COLUMNS = ['Concentric Impulse % (Asym) (%)', 'Eccentric Braking Impulse % (Asym) (%)']
+
+# Column order of the real export
+CMJ_COLUMNS = [
+    'Name', 'ExternalId', 'Test Type', 'Date', 'Time', 'BW [KG]', 'Reps', 'Tags', 'Additional Load [lb]',
+    'RSI-modified [m/s]', 'Jump Height (Imp-Mom) in Inches [in]', 'Concentric Impulse [N s]',
+    'Contraction Time [ms]', 'Vertical Velocity at Takeoff [m/s]', 'Concentric Impulse % (Asym) (%)',
+    'Eccentric Braking Impulse % (Asym) (%)', 'Concentric Peak Force [N]', 'Countermovement Depth [cm]',
+    'Eccentric Braking Impulse [N s]', 'Eccentric Deceleration Impulse [N s]', 'Eccentric Duration [ms]',
+    'Eccentric Peak Velocity [m/s]', 'Eccentric Peak Power [W]', 'Eccentric Unloading Impulse [N s]',
+    'Flight Time:Contraction Time', 'Lower-Limb Stiffness [N/m]', 'P2 Concentric Impulse:P1 Concentric Impulse',
+    'Peak Power [W]', 'Force at Zero Velocity [N]'
+]
+
+# The real export has ~53 tests per athlete
+TESTS_PER_ATHLETE = 50
+
+def athlete_count(n_rows):
+    """Number of athletes for a given export size"""
+    return max(len(POSITION_WEIGHTS), n_rows // TESTS_PER_ATHLETE)
+
+def generate_roster(n_athletes, seed=0):
+    """Roster with Jersey Number, Name and Position columns"""
+    rng = np.random.default_rng(seed)
+    positions = np.array(list(POSITION_WEIGHTS))
+    weights = np.array(list(POSITION_WEIGHTS.values()), dtype=float)
+    return pd.DataFrame({
+        'Jersey Number': np.arange(n_athletes) % 100,
+        'Name': [f'Athlete {i:06d}' for i in range(n_athletes)],
+        'Position': rng.choice(positions, size=n_athletes, p=weights / weights.sum())
+    })
+
+def _asymmetry_strings(rng, n_rows):
+    """Strings like '9.4 L' / '7.6 R'"""
+    magnitude = pd.Series(np.abs(rng.normal(0, 8, n_rows)).round(1)).astype(str)
+    side = pd.Series(rng.choice(np.array([' L', ' R']), size=n_rows))
+    return (magnitude + side).values
+
+def generate_cmj_data(n_rows, roster, start='2023-01-01', days=1000, seed=0):
+    """CMJ export with the real file's 29 columns, newest tests first"""
+    rng = np.random.default_rng(seed + 1)
+    n_athletes = len(roster)
+    athlete = rng.integers(0, n_athletes, n_rows)
+
+    # Every athlete sits at a stable z-score; position groups shift it a bit
+    athlete_z = rng.normal(0, 1, n_athletes)
+    position_codes, _ = pd.factorize(roster['Position'])
+    position_shift = rng.normal(0, 0.5, position_codes.max() + 1)[position_codes]
+    row_z = (0.8 * athlete_z + position_shift)[athlete]
+
+    timestamps = (
+        pd.Timestamp(start)
+        + pd.to_timedelta(rng.integers(0, days, n_rows), unit='D')
+        + pd.to_timedelta(rng.integers(6 * 60, 18 * 60, n_rows), unit='min')
+    ).sort_values(ascending=False)
+
+    data = {
+        'Name': roster['Name'].values[athlete],
+        'ExternalId': np.full(n_rows, np.nan),
+        'Test Type': np.full(n_rows, 'CMJ'),
+        'Date': timestamps.strftime('%m/%d/%Y'),
+        # "4:42 PM": strip the hour's leading zero like the export does
+        'Time': pd.Series(timestamps.strftime('%I:%M %p')).str.lstrip('0').values,
+        'Reps': rng.choice(np.array([1, 2, 3]), size=n_rows, p=[0.06, 0.93, 0.01]),
+        'Tags': np.full(n_rows, np.nan),
+        'Additional Load [lb]': np.zeros(n_rows, dtype=int),
+    }
+    for column, mean, sd, decimals in METRIC_SPECS:
+        values = mean + sd * (row_z + 0.6 * rng.normal(0, 1, n_rows))
+        data[column] = values.round().astype(int) if decimals == 0 else values.round(decimals)
+    for column in ASYMMETRY_COLUMNS:
+        data[column] = _asymmetry_strings(rng, n_rows)
+
+    return pd.DataFrame(data)[CMJ_COLUMNS]
+
+def write_dataset(n_rows, output_dir, seed=0):
+    """Write CMJ_Data_Synthetic_<rows>.csv and Roster_Synthetic_<rows>.csv
+
+    Returns the (cmj_path, roster_path) pair.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    roster = generate_roster(athlete_count(n_rows), seed)
+    cmj_data = generate_cmj_data(n_rows, roster, seed=seed)
+    cmj_path = output_dir / f'CMJ_Data_Synthetic_{n_rows}.csv'
+    roster_path = output_dir / f'Roster_Synthetic_{n_rows}.csv'
+    cmj_data.to_csv(cmj_path, index=False)
+    roster.to_csv(roster_path, index=False)
+    return cmj_path, roster_path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic CMJ export and roster files")
+    parser.add_argument('--rows', type=int, action='append', required=True, help="Rows in the CMJ file; repeatable")
+    parser.add_argument('--output-dir', required=True)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    for n_rows in args.rows:
+        cmj_path, roster_path = write_dataset(n_rows, args.output_dir, args.seed)
+        print(f"{cmj_path} ({n_rows} rows), {roster_path}")
+
+if __name__ == '__main__':
+    main()
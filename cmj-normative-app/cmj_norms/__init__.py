@@ -0,0 +1,21 @@
+"""Headless CMJ normative analysis: the computation behind the Streamlit app
+
+The app (app.py) is a thin client over this package; the same pipeline runs
+from the command line with ``python -m cmj_norms``.
+"""
+from .export import build_excel_sheets, sanitize_sheet_name, to_excel, write_analysis_files
+from .history import append_to_history, read_history
+from .ingest import (default_metric_columns, detect_athlete_column, detect_date_columns,
+                     detect_position_column, get_numeric_columns, get_text_columns, load_data)
+from .norms import calculate_percentile_ranks, calculate_percentiles, calculate_position_norms
+from .pipeline import AnalysisResult, build_individual_results, merge_roster, run_analysis
+from .sketch import QuantileSketch, RunningStats, stream_position_norms
+
+__all__ = [
+    'AnalysisResult', 'QuantileSketch', 'RunningStats',
+    'append_to_history', 'build_excel_sheets', 'build_individual_results', 'calculate_percentile_ranks',
+    'calculate_percentiles', 'calculate_position_norms', 'default_metric_columns', 'detect_athlete_column',
+    'detect_date_columns', 'detect_position_column', 'get_numeric_columns', 'get_text_columns', 'load_data',
+    'merge_roster', 'read_history', 'run_analysis', 'sanitize_sheet_name', 'stream_position_norms', 'to_excel',
+    'write_analysis_files',
+]
@@ -0,0 +1,170 @@
+"""Compiled norms artifact: a normative dataset frozen into one memory-mappable file
+
+Layout (little-endian):
+
+    8 bytes   ARTIFACT_MAGIC
+    8 bytes   uint64 length of the JSON header, including padding
+    header    UTF-8 JSON, space-padded so the values start 8-byte aligned
+    values    float64 sorted values of every (position, metric), back to back
+
+The header lists each (position, metric) group with its offset and length
+into the values plus its normative table row, the date window of the tests,
+and each metric's unit. Loading reads the header and memory-maps the values,
+so no raw test data is needed and nothing is parsed or grouped; ranking a
+new value is a binary search over its group.
+"""
+import json
+import os
+import re
+import struct
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .dates import parse_dates
+from .ingest import restore_float64
+from .norms import NORMATIVE_COLUMNS, calculate_position_norms
+
+ARTIFACT_MAGIC = b'CMJNORM1'
+ARTIFACT_VERSION = 1
+# Group ranked against every position's values, as in the normative tables
+ALL_POSITIONS = 'ALL POSITIONS'
+# Unit in a ForceDecks column name, e.g. "Peak Power [W]" -> "W"
+UNIT_PATTERN = re.compile(r'\[([^\]]+)\]\s*$')
+_PREFIX = struct.Struct('<8sQ')
+
+
+def metric_unit(metric_col):
+    """Unit in brackets at the end of a metric column name, or None"""
+    match = UNIT_PATTERN.search(metric_col)
+    return match.group(1) if match else None
+
+def _date_window(analysis_data, date_column):
+    """First and last test date (YYYY-MM-DD) of the data, or None"""
+    if not date_column or date_column not in analysis_data.columns:
+        return None
+    dates = parse_dates(analysis_data[date_column]).dropna()
+    if len(dates) == 0:
+        return None
+    return {'column': date_column, 'start': dates.min().strftime('%Y-%m-%d'), 'end': dates.max().strftime('%Y-%m-%d')}
+
+def compile_artifact(analysis_data, position_column, metric_columns, path, date_column=None, source=None):
+    """Write the norms of analysis_data to a compiled artifact at path
+
+    analysis_data is the merged, filtered data the normative tables are
+    built from (AnalysisResult.analysis_data). source is free-form JSON
+    metadata stored with it (e.g. file names and filters). The file is
+    written next to path and moved into place, so a reader never maps a
+    half-written artifact. Returns the path.
+    """
+    normative_dfs = calculate_position_norms(analysis_data, position_column, metric_columns)
+    grouped = analysis_data.groupby(position_column, observed=True).indices
+
+    groups, arrays, offset = [], [], 0
+    for metric_col in metric_columns:
+        metric_values = restore_float64(analysis_data[metric_col]).to_numpy(dtype=float)
+        group_rows = {str(position): rows for position, rows in grouped.items()}
+        group_rows[ALL_POSITIONS] = slice(None)
+        stats = normative_dfs[metric_col].set_index('Position')
+        for position, rows in group_rows.items():
+            values = np.sort(metric_values[rows]).astype('<f8')
+            row = stats.loc[position]
+            groups.append({
+                'position': position,
+                'metric': metric_col,
+                'offset': offset,
+                'length': len(values),
+                'stats': {col: int(row[col]) if col == 'N' else float(row[col]) for col in NORMATIVE_COLUMNS[1:]},
+            })
+            arrays.append(values)
+            offset += len(values)
+
+    header = json.dumps({
+        'version': ARTIFACT_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'source': source or {},
+        'date_window': _date_window(analysis_data, date_column),
+        'metrics': {metric_col: {'unit': metric_unit(metric_col)} for metric_col in metric_columns},
+        'groups': groups,
+    }).encode('utf-8')
+    header += b' ' * (-(_PREFIX.size + len(header)) % 8)
+
+    path = Path(path)
+    tmp_path = path.with_name(f'.{path.name}.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREFIX.pack(ARTIFACT_MAGIC, len(header)))
+        f.write(header)
+        for values in arrays:
+            f.write(values.tobytes())
+    os.replace(tmp_path, path)
+    return path
+
+class NormsArtifact:
+    """A loaded artifact: header metadata plus memory-mapped sorted values"""
+
+    def __init__(self, header, values):
+        self.header = header
+        self._values = values
+        self._groups = {(group['position'], group['metric']): group for group in header['groups']}
+
+    @classmethod
+    def load(cls, path):
+        """Read the header and map the values; raises ValueError if path is not an artifact"""
+        with open(path, 'rb') as f:
+            prefix = f.read(_PREFIX.size)
+            if len(prefix) < _PREFIX.size:
+                raise ValueError(f"{path} is not a compiled norms artifact")
+            magic, header_length = _PREFIX.unpack(prefix)
+            if magic != ARTIFACT_MAGIC:
+                raise ValueError(f"{path} is not a compiled norms artifact")
+            header = json.loads(f.read(header_length))
+        total = sum(group['length'] for group in header['groups'])
+        if total == 0:
+            values = np.empty(0, dtype='<f8')
+        else:
+            values = np.memmap(path, dtype='<f8', mode='r', offset=_PREFIX.size + header_length, shape=(total,))
+        return cls(header, values)
+
+    @property
+    def metrics(self):
+        return list(self.header['metrics'])
+
+    @property
+    def positions(self):
+        return sorted({position for position, _ in self._groups if position != ALL_POSITIONS})
+
+    @property
+    def date_window(self):
+        return self.header['date_window']
+
+    def unit(self, metric_col):
+        return self.header['metrics'][metric_col]['unit']
+
+    def values(self, position, metric_col):
+        """Sorted values of one group: a view into the mapped file, or None if absent"""
+        group = self._groups.get((position, metric_col))
+        if group is None:
+            return None
+        return self._values[group['offset']:group['offset'] + group['length']]
+
+    def percentile_ranks(self, position, metric_col, values):
+        """Percentile rank of each value within its group (rule of calculate_percentile_ranks)"""
+        group_values = self.values(position, metric_col)
+        if group_values is None:
+            raise KeyError(f"No norms for position '{position}' and metric '{metric_col}'")
+        below = group_values.searchsorted(np.asarray(values, dtype=float), side='left')
+        return np.round(below / len(group_values) * 100, 2)
+
+    def normative_dfs(self):
+        """The normative tables stored in the artifact, as calculate_position_norms returns them"""
+        tables = {metric_col: [] for metric_col in self.metrics}
+        for group in self.header['groups']:
+            tables[group['metric']].append({'Position': group['position'], **group['stats']})
+        normative_dfs = {}
+        for metric_col, rows in tables.items():
+            norms = pd.DataFrame(rows, columns=NORMATIVE_COLUMNS)
+            norms['N'] = norms['N'].astype(int)
+            normative_dfs[metric_col] = norms
+        return normative_dfs
@@ -0,0 +1,117 @@
+"""Bootstrap confidence intervals for the percentiles of the normative tables"""
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .ingest import restore_float64
+
+# Defaults: replicates per (position, metric), interval width and seed
+BOOTSTRAP_REPLICATES = 2000
+BOOTSTRAP_CONFIDENCE = 0.95
+BOOTSTRAP_SEED = 0
+# Most resampled values held at once per group; larger groups resample in chunks
+BOOTSTRAP_CHUNK_VALUES = 4_000_000
+
+# Normative table columns that get an interval, with their quantile levels
+PERCENTILE_LEVELS = {'P25': 0.25, 'P50 (Median)': 0.5, 'P75': 0.75, 'P90': 0.9}
+
+
+def ci_columns(percentile_column):
+    """Names of the lower and upper interval columns for a percentile column"""
+    return f'{percentile_column} CI Low', f'{percentile_column} CI High'
+
+def bootstrap_quantiles(values, levels, n_replicates, seed):
+    """Quantiles of n_replicates resamples of values, as a (replicates, levels) array
+
+    All replicates are drawn as one matrix of indices into the sorted values.
+    Sorting each row of indices sorts the resample (values are sorted), so
+    each quantile is read at fixed positions with np.percentile's linear
+    interpolation, without sorting any values.
+    """
+    values = np.sort(values)
+    n = len(values)
+    rng = np.random.default_rng(seed)
+    # The narrowest index type sorts fastest
+    index_dtype = next(dtype for dtype in (np.int16, np.int32, np.int64) if n <= np.iinfo(dtype).max)
+    positions = (n - 1) * np.asarray(levels)
+    lower = np.floor(positions).astype(int)
+    upper = np.minimum(lower + 1, n - 1)
+    weight = positions - lower
+
+    chunk = max(1, BOOTSTRAP_CHUNK_VALUES // n)
+    results = []
+    for start in range(0, n_replicates, chunk):
+        indices = rng.integers(0, n, size=(min(chunk, n_replicates - start), n), dtype=index_dtype)
+        indices.sort(axis=1)
+        results.append(values[indices[:, lower]] * (1 - weight) + values[indices[:, upper]] * weight)
+    return np.concatenate(results)
+
+def _name_key(name):
+    """Stable 32-bit key of a metric or group name, for seeding"""
+    return zlib.crc32(str(name).encode('utf-8'))
+
+def _bootstrap_interval(job):
+    """Interval bounds (levels x 2) for one group; runs in a worker process"""
+    values, levels, n_replicates, confidence, seed = job
+    replicates = bootstrap_quantiles(values, levels, n_replicates, seed)
+    tail = (1 - confidence) / 2 * 100
+    return np.percentile(replicates, [tail, 100 - tail], axis=0).T
+
+def bootstrap_percentile_cis(data, position_col, metric_cols, n_replicates=BOOTSTRAP_REPLICATES,
+                             confidence=BOOTSTRAP_CONFIDENCE, seed=BOOTSTRAP_SEED, workers=None):
+    """Percentile bootstrap intervals for P25-P90 of every position and metric
+
+    Groups match calculate_position_norms (positions sorted, then 'ALL
+    POSITIONS'). Each (metric, group) draws from its own seed sequence,
+    built from seed and the metric and group names, so its interval is the
+    same for any number of workers and whichever other metrics are
+    included (the app computes metrics separately). Groups are spread over
+    a process pool of workers processes (default: CPU count; 1 runs
+    inline). Returns a dict of metric -> DataFrame with a Position column
+    and a low/high column pair per percentile (see ci_columns).
+    """
+    levels = list(PERCENTILE_LEVELS.values())
+    grouped = dict(tuple(data.groupby(position_col, observed=True)))
+    positions = sorted(grouped)
+
+    group_names = positions + ['ALL POSITIONS']
+    jobs = []
+    for metric_col in metric_cols:
+        for position in group_names:
+            values = grouped[position][metric_col] if position in grouped else data[metric_col]
+            job_seed = np.random.SeedSequence([seed, _name_key(metric_col), _name_key(position)])
+            jobs.append((restore_float64(values).to_numpy(dtype=float), levels, n_replicates, confidence, job_seed))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        intervals = [_bootstrap_interval(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            intervals = list(pool.map(_bootstrap_interval, jobs, chunksize=max(1, len(jobs) // (4 * workers))))
+
+    cis = {}
+    for i, metric_col in enumerate(metric_cols):
+        metric_intervals = intervals[i * len(group_names):(i + 1) * len(group_names)]
+        table = {'Position': group_names}
+        for j, percentile_col in enumerate(PERCENTILE_LEVELS):
+            low_col, high_col = ci_columns(percentile_col)
+            table[low_col] = [round(bounds[j, 0], 2) for bounds in metric_intervals]
+            table[high_col] = [round(bounds[j, 1], 2) for bounds in metric_intervals]
+        cis[metric_col] = pd.DataFrame(table)
+    return cis
+
+def add_confidence_intervals(normative_dfs, cis):
+    """Normative tables with each percentile's interval columns right after it"""
+    with_cis = {}
+    for metric_col, normative_df in normative_dfs.items():
+        merged = normative_df.merge(cis[metric_col], on='Position', how='left')
+        columns = []
+        for col in normative_df.columns:
+            columns.append(col)
+            if col in PERCENTILE_LEVELS:
+                columns.extend(ci_columns(col))
+        with_cis[metric_col] = merged[columns]
+    return with_cis
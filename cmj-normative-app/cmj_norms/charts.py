@@ -0,0 +1,69 @@
+"""Altair distribution charts built from histograms and normative tables (Baylor branding)"""
+import altair as alt
+import pandas as pd
+
+BAYLOR_GREEN = '#003015'
+BAYLOR_GOLD = '#FFB81C'
+
+
+def _athlete_marker(athlete_name, value):
+    return pd.DataFrame({'Athlete': [athlete_name], 'Value': [value]})
+
+def histogram_chart(histograms, position, metric_col, athlete_name=None, athlete_value=None):
+    """Bar histogram of one position, with a gold rule at the athlete's value
+
+    histograms is the output of position_histograms for metric_col.
+    """
+    bins = histograms[histograms['Position'] == position]
+    chart = alt.Chart(bins).mark_bar(color=BAYLOR_GREEN, opacity=0.85).encode(
+        x=alt.X('Bin Start:Q', bin='binned', title=metric_col),
+        x2='Bin End:Q',
+        y=alt.Y('Count:Q', title='Tests'),
+        tooltip=[alt.Tooltip('Bin Start:Q', format='.2f'), alt.Tooltip('Bin End:Q', format='.2f'),
+                 'Count:Q', alt.Tooltip('Share:Q', format='.1%')]
+    )
+    if athlete_value is not None:
+        marker = _athlete_marker(athlete_name, athlete_value)
+        chart += alt.Chart(marker).mark_rule(color=BAYLOR_GOLD, strokeWidth=3).encode(
+            x='Value:Q', tooltip=['Athlete:N', alt.Tooltip('Value:Q', format='.2f')]
+        )
+        chart += alt.Chart(marker).mark_text(align='left', dx=4, dy=-4, color=BAYLOR_GOLD, fontWeight='bold').encode(
+            x='Value:Q', y=alt.value(0), text='Athlete:N'
+        )
+    return chart.properties(title=f'{position}: {metric_col}', height=300)
+
+def box_chart(normative_df, metric_col, athlete_name=None, athlete_value=None, athlete_position=None):
+    """Box plot per position from its normative table row
+
+    Whiskers span Min-Max, the box P25-P75 with a tick at the median and a
+    dot at P90, so the chart needs one row per position instead of the tests.
+    The athlete's value is a gold point on their position.
+    """
+    boxes = normative_df.rename(columns={'P50 (Median)': 'P50'})
+    position_axis = alt.Y('Position:N', sort=list(boxes['Position']), title=None)
+    base = alt.Chart(boxes).encode(y=position_axis)
+    tooltip = ['Position:N', 'N:Q'] + [alt.Tooltip(f'{col}:Q', format='.2f')
+                                       for col in ['Min', 'P25', 'P50', 'P75', 'P90', 'Max']]
+    chart = (
+        base.mark_rule(color=BAYLOR_GREEN).encode(x=alt.X('Min:Q', title=metric_col), x2='Max:Q', tooltip=tooltip)
+        + base.mark_bar(color=BAYLOR_GREEN, opacity=0.35, size=14).encode(x='P25:Q', x2='P75:Q', tooltip=tooltip)
+        + base.mark_tick(color=BAYLOR_GREEN, thickness=3, size=14).encode(x='P50:Q', tooltip=tooltip)
+        + base.mark_point(color=BAYLOR_GREEN, filled=True, size=30).encode(x='P90:Q', tooltip=tooltip)
+    )
+    if athlete_value is not None and athlete_position is not None:
+        marker = _athlete_marker(athlete_name, athlete_value).assign(Position=athlete_position)
+        chart += alt.Chart(marker).mark_point(color=BAYLOR_GOLD, filled=True, size=160, shape='diamond').encode(
+            x='Value:Q', y=position_axis, tooltip=['Athlete:N', alt.Tooltip('Value:Q', format='.2f')]
+        )
+    return chart.properties(title=f'{metric_col} by position', height=max(200, 28 * len(boxes)))
+
+def violin_chart(histograms, metric_col):
+    """Violin per position, drawn from its histogram shares instead of a density of the tests"""
+    return alt.Chart(histograms).transform_calculate(
+        Value='(datum["Bin Start"] + datum["Bin End"]) / 2'
+    ).mark_area(orient='horizontal', color=BAYLOR_GREEN, opacity=0.7, interpolate='monotone').encode(
+        y=alt.Y('Value:Q', title=metric_col),
+        x=alt.X('Share:Q', stack='center', axis=None),
+        column=alt.Column('Position:N', header=alt.Header(labelOrient='bottom', titleOrient='bottom'), title=None),
+        tooltip=['Position:N', alt.Tooltip('Value:Q', format='.2f'), alt.Tooltip('Share:Q', format='.1%')]
+    ).properties(width=90, height=300)
@@ -0,0 +1,264 @@
+"""Command-line batch runner: many (CMJ export, roster) pairs across a process pool
+
+Example:
+
+    python -m cmj_norms run \
+        --pair football_cmj.csv football_roster.csv \
+        --pair soccer_cmj.xlsx soccer_roster.xlsx \
+        --metric "Jump Height (Imp-Mom) in Inches [in]" --metric "Peak Power [W]" \
+        --output-dir results
+
+Each pair's outputs are written to their own folder under --output-dir, named
+after the CMJ file, with the same CSV and Excel files the app downloads.
+
+``python -m cmj_norms compile`` freezes one pair's norms into an artifact
+file (see cmj_norms.artifact) and ``python -m cmj_norms serve`` answers
+percentile lookups over HTTP (see cmj_norms.server).
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .artifact import compile_artifact
+from .bootstrap import BOOTSTRAP_CONFIDENCE, add_confidence_intervals, bootstrap_percentile_cis
+from .dates import DateIndexedData, detect_time_column
+from .export import write_analysis_files
+from .ingest import (compact_schema, default_metric_columns, detect_athlete_column, detect_date_columns,
+                     detect_position_column, load_data)
+from .matching import combine_name_columns
+from .pipeline import prepare_analysis_data, run_analysis
+from .screening import SCREENING_Z_THRESHOLD
+from .sessions import SESSION_AGGREGATIONS, aggregate_sessions
+from .server import ArtifactStore, NormsStore, serve
+
+
+def load_pair(job):
+    """Load one job's files, detect its columns and apply its date filter and session aggregation
+
+    Returns (cmj_data, roster_data, athlete_id_column, position_column,
+    metric_columns, date_column); date_column is None when not filtering.
+    """
+    # Split first/last name columns are combined before the athlete column is detected
+    cmj_data = compact_schema(combine_name_columns(load_data(job['cmj_path']))[0])
+    roster_data = combine_name_columns(load_data(job['roster_path']))[0]
+
+    athlete_id_column = job['athlete_column'] or detect_athlete_column(cmj_data, roster_data)
+    position_column = job['position_column'] or detect_position_column(roster_data)
+    metric_columns = job['metrics'] or default_metric_columns(cmj_data)[1]
+
+    date_column = None
+    if job['years'] or job['start'] or job['end']:
+        potential_date_cols = detect_date_columns(cmj_data)
+        date_column = job['date_column'] or (potential_date_cols[0] if potential_date_cols else None)
+        if date_column is None:
+            raise ValueError("No date columns detected in CMJ data")
+        # Parse and sort by test time once, then slice by binary search
+        dated = DateIndexedData.build(cmj_data, date_column, detect_time_column(cmj_data, date_column))
+        if dated.n_unparsed:
+            print(f"{job['cmj_path']}: {dated.n_unparsed} tests have a '{date_column}' value that is not a date "
+                  "and are left out of the date filter", file=sys.stderr)
+        if job['years']:
+            cmj_data = dated.years(job['years'])
+        else:
+            cmj_data = dated.date_range(job['start'] or dated.min_date, job['end'] or dated.max_date)
+
+    if job['sessions']:
+        potential_date_cols = detect_date_columns(cmj_data)
+        session_date_column = job['date_column'] or (potential_date_cols[0] if potential_date_cols else None)
+        if session_date_column is None:
+            raise ValueError("Session aggregation needs a date column in the CMJ data")
+        cmj_data = aggregate_sessions(cmj_data, athlete_id_column, session_date_column, metric_columns, job['sessions'])
+    return cmj_data, roster_data, athlete_id_column, position_column, metric_columns, date_column
+
+def process_pair(job):
+    """Load, analyze and export one (CMJ file, roster file) pair
+
+    Runs in a worker process; returns a summary dict instead of raising so
+    one bad pair does not stop the batch.
+    """
+    try:
+        cmj_data, roster_data, athlete_id_column, position_column, metric_columns, _ = load_pair(job)
+        result = run_analysis(cmj_data, roster_data, athlete_id_column, position_column, metric_columns,
+                              match_names=not job['exact_names'], outlier_threshold=job['outliers'])
+        if job['bootstrap']:
+            # Already inside a worker process, so resample inline
+            result.normative_dfs = add_confidence_intervals(
+                result.normative_dfs,
+                bootstrap_percentile_cis(result.analysis_data, position_column, metric_columns, workers=1)
+            )
+        written = write_analysis_files(result, job['output_dir'])
+        return {
+            'name': job['name'],
+            'ok': True,
+            'records': len(result.analysis_data),
+            'positions': len(result.positions),
+            'renamed': 0 if result.name_matches is None else int(
+                result.name_matches['Match'].isin(['normalized', 'fuzzy']).sum()
+            ),
+            'files': [str(path) for path in written]
+        }
+    except Exception as e:
+        return {'name': job['name'], 'ok': False, 'error': str(e)}
+
+def build_jobs(args):
+    """One job per --pair, each with its own output folder"""
+    jobs = []
+    used_names = set()
+    for cmj_path, roster_path in args.pair:
+        name = Path(cmj_path).stem
+        suffix = 2
+        while name in used_names:
+            name = f"{Path(cmj_path).stem}_{suffix}"
+            suffix += 1
+        used_names.add(name)
+        jobs.append({
+            'name': name,
+            'cmj_path': cmj_path,
+            'roster_path': roster_path,
+            'output_dir': str(Path(args.output_dir) / name),
+            'athlete_column': args.athlete_column,
+            'position_column': args.position_column,
+            'metrics': args.metric,
+            'date_column': args.date_column,
+            'years': args.year,
+            'start': args.start,
+            'end': args.end,
+            'exact_names': args.exact_names,
+            'sessions': args.sessions,
+            'outliers': args.exclude_outliers,
+            'bootstrap': args.bootstrap
+        })
+    return jobs
+
+def compile_pair(args):
+    """Analyze the --cmj/--roster pair and write its norms artifact"""
+    job = {
+        'cmj_path': args.cmj,
+        'roster_path': args.roster,
+        'athlete_column': args.athlete_column,
+        'position_column': args.position_column,
+        'metrics': args.metric,
+        'date_column': args.date_column,
+        'years': args.year,
+        'start': args.start,
+        'end': args.end,
+        'sessions': args.sessions,
+        'outliers': args.exclude_outliers,
+    }
+    cmj_data, roster_data, athlete_id_column, position_column, metric_columns, date_column = load_pair(job)
+    _, _, analysis_data, _ = prepare_analysis_data(
+        cmj_data, roster_data, athlete_id_column, position_column, metric_columns, match_names=not args.exact_names,
+        outlier_threshold=args.exclude_outliers
+    )
+    if date_column is None:
+        potential_date_cols = detect_date_columns(cmj_data)
+        date_column = potential_date_cols[0] if potential_date_cols else None
+    source = {
+        'cmj_file': Path(args.cmj).name,
+        'roster_file': Path(args.roster).name,
+        'filters': {key: job[key] for key in ('years', 'start', 'end', 'sessions', 'outliers') if job[key]},
+    }
+    return compile_artifact(analysis_data, position_column, metric_columns, args.output,
+                            date_column=date_column, source=source)
+
+def run_batch(jobs, workers):
+    """Process jobs in a process pool (inline when workers == 1)"""
+    if workers == 1 or len(jobs) == 1:
+        return [process_pair(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(process_pair, jobs))
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m cmj_norms', description="CMJ normative performance analysis")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Analyze (CMJ file, roster file) pairs and write the app's exports")
+    run_parser.add_argument('--pair', nargs=2, action='append', required=True, metavar=('CMJ_FILE', 'ROSTER_FILE'),
+                            help="CMJ export and matching roster (CSV/Excel); repeat for each team")
+    run_parser.add_argument('--output-dir', required=True, help="Folder that receives one subfolder per pair")
+    run_parser.add_argument('--metric', action='append', help="Metric column to analyze; repeatable (default: first 3 numeric columns)")
+    run_parser.add_argument('--athlete-column', help="Athlete ID column (default: auto-detect)")
+    run_parser.add_argument('--position-column', help="Roster position column (default: auto-detect)")
+    run_parser.add_argument('--date-column', help="Date column used by --year/--start/--end (default: auto-detect)")
+    run_parser.add_argument('--year', type=int, action='append', help="Only include tests from this year; repeatable")
+    run_parser.add_argument('--start', help="Only include tests on or after this date")
+    run_parser.add_argument('--end', help="Only include tests on or before this date")
+    run_parser.add_argument('--sessions', choices=list(SESSION_AGGREGATIONS),
+                        help="Combine each athlete's tests on the same day: highest, mean or top2 (mean of highest 2)")
+    run_parser.add_argument('--exclude-outliers', type=float, nargs='?', const=SCREENING_Z_THRESHOLD, metavar='Z',
+                            help=f"Exclude tests beyond Z robust SDs of their position's median, or 0 where the median "
+                                 f"is not (default Z: {SCREENING_Z_THRESHOLD})")
+    run_parser.add_argument('--exact-names', action='store_true',
+                            help="Match athletes to the roster by exact name only (default: also normalized and fuzzy)")
+    run_parser.add_argument('--bootstrap', action='store_true',
+                            help=f"Add {BOOTSTRAP_CONFIDENCE * 100:.0f}%% bootstrap confidence intervals to the normative percentiles")
+    run_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+
+    compile_parser = subparsers.add_parser('compile', help="Freeze one pair's norms into an artifact file for scoring")
+    compile_parser.add_argument('--cmj', required=True, help="CMJ export the norms are built from (CSV/Excel)")
+    compile_parser.add_argument('--roster', required=True, help="Roster with each athlete's position (CSV/Excel)")
+    compile_parser.add_argument('--output', required=True, help="Artifact file to write (e.g. norms.cmjn)")
+    compile_parser.add_argument('--metric', action='append', help="Metric column to include; repeatable (default: first 3 numeric columns)")
+    compile_parser.add_argument('--athlete-column', help="Athlete ID column (default: auto-detect)")
+    compile_parser.add_argument('--position-column', help="Roster position column (default: auto-detect)")
+    compile_parser.add_argument('--date-column', help="Date column used by --year/--start/--end (default: auto-detect)")
+    compile_parser.add_argument('--year', type=int, action='append', help="Only include tests from this year; repeatable")
+    compile_parser.add_argument('--start', help="Only include tests on or after this date")
+    compile_parser.add_argument('--end', help="Only include tests on or before this date")
+    compile_parser.add_argument('--sessions', choices=list(SESSION_AGGREGATIONS),
+                            help="Combine each athlete's tests on the same day: highest, mean or top2 (mean of highest 2)")
+    compile_parser.add_argument('--exclude-outliers', type=float, nargs='?', const=SCREENING_Z_THRESHOLD, metavar='Z',
+                                help=f"Exclude tests beyond Z robust SDs of their position's median, or 0 where the "
+                                     f"median is not (default Z: {SCREENING_Z_THRESHOLD})")
+    compile_parser.add_argument('--exact-names', action='store_true',
+                                help="Match athletes to the roster by exact name only (default: also normalized and fuzzy)")
+
+    serve_parser = subparsers.add_parser('serve', help="Serve percentile lookups for new test values over HTTP")
+    serve_parser.add_argument('--cmj', help="CMJ export the norms are built from (CSV/Excel)")
+    serve_parser.add_argument('--roster', help="Roster with each athlete's position (CSV/Excel)")
+    serve_parser.add_argument('--artifact', help="Compiled norms artifact to serve instead of --cmj/--roster")
+    serve_parser.add_argument('--metric', action='append', help="Metric column to score; repeatable (default: first 3 numeric columns)")
+    serve_parser.add_argument('--athlete-column', help="Athlete ID column (default: auto-detect)")
+    serve_parser.add_argument('--position-column', help="Roster position column (default: auto-detect)")
+    serve_parser.add_argument('--exact-names', action='store_true',
+                              help="Match athletes to the roster by exact name only (default: also normalized and fuzzy)")
+    serve_parser.add_argument('--host', default='127.0.0.1', help="Address to listen on (default: 127.0.0.1)")
+    serve_parser.add_argument('--port', type=int, default=8765, help="Port to listen on (default: 8765)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'run':
+        results = run_batch(build_jobs(args), max(1, args.workers))
+        for result in results:
+            if result['ok']:
+                print(f"{result['name']}: {result['records']} records, {result['positions']} positions, "
+                      f"{result['renamed']} names matched to the roster -> {len(result['files'])} files")
+            else:
+                print(f"{result['name']}: FAILED - {result['error']}", file=sys.stderr)
+        return 0 if all(result['ok'] for result in results) else 1
+    if args.command == 'compile':
+        try:
+            path = compile_pair(args)
+        except (OSError, ValueError) as e:
+            print(f"Cannot compile norms: {e}", file=sys.stderr)
+            return 1
+        print(f"Wrote {path} ({path.stat().st_size:,} bytes)")
+        return 0
+    if args.command == 'serve':
+        if not args.artifact and not (args.cmj and args.roster):
+            print("serve needs --artifact, or both --cmj and --roster", file=sys.stderr)
+            return 2
+        try:
+            if args.artifact:
+                store = ArtifactStore(args.artifact)
+            else:
+                store = NormsStore(args.cmj, args.roster, args.athlete_column, args.position_column, args.metric,
+                                   match_names=not args.exact_names)
+        except (OSError, ValueError) as e:
+            print(f"Cannot build norms: {e}", file=sys.stderr)
+            return 1
+        return serve(store, args.host, args.port)
+    return 2
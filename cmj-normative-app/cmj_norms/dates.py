@@ -0,0 +1,143 @@
+"""Parsing test dates/times and filtering on data sorted by test time"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Formats tried, in order, when detecting how a date or time column is written.
+# ForceDecks exports use MM/DD/YYYY dates and 12-hour times like "4:42 PM".
+DATE_FORMATS = ['%m/%d/%Y', '%Y-%m-%d', '%m/%d/%y', '%Y/%m/%d', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S']
+TIME_FORMATS = ['%I:%M %p', '%I:%M:%S %p', '%H:%M', '%H:%M:%S']
+
+# Distinct values checked when detecting a format
+FORMAT_SAMPLE_SIZE = 200
+
+
+def detect_format(values, formats):
+    """Return the format that parses the most sampled values, or None
+
+    Only a bounded sample of distinct non-missing values is checked, so
+    detection costs the same for any file size. A format must parse more
+    than half of the sample, so a few typos do not hide the column's format;
+    ties go to the format listed first.
+    """
+    sample = pd.Series(pd.unique(values.dropna().astype(str).str.strip()))[:FORMAT_SAMPLE_SIZE]
+    best_fmt, best_parsed = None, len(sample) // 2
+    for fmt in formats:
+        parsed = int(pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum())
+        if parsed > best_parsed:
+            best_fmt, best_parsed = fmt, parsed
+        if parsed == len(sample):
+            break
+    return best_fmt
+
+def detect_time_column(df, date_column):
+    """Find a separate time-of-day column to combine with date_column
+
+    Looks for a column named 'Time' (or '<date column> Time') whose values
+    match one of TIME_FORMATS. Returns None if there is none.
+    """
+    candidates = ['time', f'{date_column} time'.lower(), date_column.lower().replace('date', 'time')]
+    for col in df.columns:
+        if col != date_column and col.lower() in candidates and not pd.api.types.is_numeric_dtype(df[col]):
+            if detect_format(df[col], TIME_FORMATS) is not None:
+                return col
+    return None
+
+def parse_dates(values):
+    """Parse a date column with its detected format
+
+    Values the format does not fit become NaT (DateIndexedData counts them).
+    Falls back to pandas' format inference when no known format fits, which
+    raises if the values are not dates. Values already parsed are returned
+    as they are.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    fmt = detect_format(values, DATE_FORMATS)
+    if fmt is None:
+        return pd.to_datetime(values)
+    return pd.to_datetime(values.astype(str).str.strip(), format=fmt, errors='coerce')
+
+def parse_test_timestamps(df, date_column, time_column=None):
+    """Parse date_column, plus time_column if given, into one timestamp per test
+
+    Tests with a missing or unparseable time keep midnight of their date.
+    Dates that already carry a time of day (e.g. combined earlier) are not
+    offset again.
+    """
+    timestamps = parse_dates(df[date_column])
+    if time_column is not None and (timestamps.dropna() == timestamps.dropna().dt.normalize()).all():
+        fmt = detect_format(df[time_column], TIME_FORMATS)
+        if fmt is not None:
+            times = pd.to_datetime(df[time_column].astype(str).str.strip(), format=fmt, errors='coerce')
+            timestamps = timestamps + (times - times.dt.normalize()).fillna(pd.Timedelta(0))
+    return timestamps
+
+@dataclass
+class DateIndexedData:
+    """Test data sorted by test time, for date filters by binary search
+
+    timestamps holds each row's test time in the same (sorted) order as
+    data; rows without a date sort last and are never selected. n_unparsed
+    counts the rows whose date value was present but could not be parsed.
+    """
+    data: pd.DataFrame
+    timestamps: np.ndarray
+    n_dated: int
+    n_unparsed: int = 0
+
+    @classmethod
+    def build(cls, df, date_column, time_column=None):
+        """Parse the test times and sort df by them
+
+        date_column is replaced by the parsed timestamps.
+        """
+        timestamps = parse_test_timestamps(df, date_column, time_column)
+        order = np.argsort(timestamps.to_numpy(), kind='stable')
+        sorted_timestamps = timestamps.to_numpy()[order]
+        data = df.iloc[order].assign(**{date_column: sorted_timestamps}).reset_index(drop=True)
+        n_unparsed = int((df[date_column].notna() & timestamps.isna()).sum())
+        return cls(data, sorted_timestamps, int(timestamps.notna().sum()), n_unparsed)
+
+    @property
+    def min_date(self):
+        return pd.Timestamp(self.timestamps[0]) if self.n_dated else None
+
+    @property
+    def max_date(self):
+        return pd.Timestamp(self.timestamps[self.n_dated - 1]) if self.n_dated else None
+
+    def available_years(self):
+        """Years with at least one test, in order"""
+        if not self.n_dated:
+            return []
+        return [year for year in range(self.min_date.year, self.max_date.year + 1)
+                if np.subtract(*self._year_bounds(year)) != 0]
+
+    def _bounds(self, start, stop):
+        """Row positions of tests from start (inclusive) to stop (exclusive)"""
+        dated = self.timestamps[:self.n_dated]
+        return (dated.searchsorted(np.datetime64(pd.Timestamp(start)), side='left'),
+                dated.searchsorted(np.datetime64(pd.Timestamp(stop)), side='left'))
+
+    def _year_bounds(self, year):
+        return self._bounds(pd.Timestamp(year=int(year), month=1, day=1),
+                            pd.Timestamp(year=int(year) + 1, month=1, day=1))
+
+    def date_range(self, start_date, end_date):
+        """Tests dated from start_date through the whole of end_date"""
+        start, stop = self._bounds(pd.Timestamp(start_date).normalize(),
+                                   pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1))
+        return self.data.iloc[start:stop]
+
+    def years(self, years):
+        """Tests from the given years, with a Year column added"""
+        bounds = [self._year_bounds(year) for year in sorted(years)]
+        if bounds and all(stop == next_start for (_, stop), (next_start, _) in zip(bounds, bounds[1:])):
+            # Consecutive years are one slice instead of a gather of row positions
+            rows = slice(bounds[0][0], bounds[-1][1])
+        else:
+            rows = np.concatenate([np.arange(start, stop) for start, stop in bounds] or [np.array([], dtype=int)])
+        filtered = self.data.iloc[rows]
+        return filtered.assign(Year=pd.DatetimeIndex(self.timestamps[rows]).year)
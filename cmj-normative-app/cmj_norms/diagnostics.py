@@ -0,0 +1,153 @@
+"""Per-stage wall time and peak memory of one pipeline run"""
+import cProfile
+import io
+import json
+import platform
+import pstats
+import threading
+import time
+import tracemalloc
+import weakref
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Functions listed in the profile of a stage, by cumulative time
+PROFILE_TOP_FUNCTIONS = 30
+
+STAGE_COLUMNS = ['Stage', 'Seconds', 'Peak Memory (MB)', 'Calls']
+
+# Live timers tracing memory, and whether tracing was started for them (and
+# so is theirs to stop) rather than already running when the first began
+_tracing_lock = threading.Lock()
+_tracing_state = {'timers': 0, 'started': False}
+
+
+def _acquire_tracing():
+    with _tracing_lock:
+        if _tracing_state['timers'] == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_state['started'] = True
+        _tracing_state['timers'] += 1
+
+def _release_tracing():
+    with _tracing_lock:
+        _tracing_state['timers'] -= 1
+        if _tracing_state['timers'] == 0 and _tracing_state['started']:
+            tracemalloc.stop()
+            _tracing_state['started'] = False
+
+class StageTimer:
+    """Records the wall time and peak memory of each named stage of a run
+
+    Wall time is always recorded. With trace_memory, allocations are traced
+    with tracemalloc and each stage reports its peak above what was in use
+    when it began, covering the Python and NumPy/pandas buffers it
+    allocated. Tracing slows allocation-heavy stages several times over and
+    is process-wide (concurrent sessions add to it), so it is off by
+    default. Tracing the timers started is stopped once the last timer
+    tracing memory is closed or garbage collected; tracing started
+    elsewhere (e.g. by a benchmark) is left running. Stages must not be
+    nested. A stage entered more than once
+    (e.g. styling one table per metric) is summed, with the largest peak.
+    The stage named profile_stage also runs under cProfile; profile holds
+    the report.
+    """
+
+    def __init__(self, trace_memory=False, profile_stage=None):
+        self.trace_memory = trace_memory
+        self._release_tracing = None
+        if trace_memory:
+            _acquire_tracing()
+            self._release_tracing = weakref.finalize(self, _release_tracing)
+        self.profile_stage = profile_stage
+        self.started = datetime.now()
+        self.stages = {}
+        self.profile = None
+        self._profiler = None
+
+    def close(self):
+        """Stop tracing memory for this timer (also done when it is garbage collected)"""
+        if self._release_tracing is not None:
+            self._release_tracing()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the body of a with block as stage name"""
+        if self.trace_memory:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        profiler = None
+        if name == self.profile_stage:
+            # One profiler across every call of the stage
+            profiler = self._profiler = self._profiler or cProfile.Profile()
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            seconds = time.perf_counter() - start
+            record = self.stages.setdefault(name, {'seconds': 0.0, 'peak_bytes': None, 'calls': 0})
+            record['seconds'] += seconds
+            if self.trace_memory:
+                peak_bytes = tracemalloc.get_traced_memory()[1] - baseline
+                record['peak_bytes'] = max(record['peak_bytes'] or 0, peak_bytes)
+            record['calls'] += 1
+            if profiler is not None:
+                self.profile = profile_report(profiler)
+
+    def run(self, name, func, *args, **kwargs):
+        """Call func under stage name and return its result"""
+        with self.stage(name):
+            return func(*args, **kwargs)
+
+    def slowest(self):
+        """Name of the stage with the most wall time, or None"""
+        if not self.stages:
+            return None
+        return max(self.stages, key=lambda name: self.stages[name]['seconds'])
+
+    def total_seconds(self):
+        return sum(record['seconds'] for record in self.stages.values())
+
+    def to_frame(self):
+        """One row per stage, in the order stages first ran"""
+        return pd.DataFrame([
+            [name, round(record['seconds'], 4), _megabytes(record['peak_bytes'], 2), record['calls']]
+            for name, record in self.stages.items()
+        ], columns=STAGE_COLUMNS)
+
+    def to_json(self):
+        """Stage timings with the run's start time and environment, as a JSON string"""
+        return json.dumps({
+            'started': self.started.isoformat(timespec='seconds'),
+            'total_seconds': round(self.total_seconds(), 6),
+            'environment': {
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'numpy': np.__version__,
+                'platform': platform.platform(),
+            },
+            'stages': [
+                {'stage': name, 'seconds': round(record['seconds'], 6),
+                 'peak_mb': _megabytes(record['peak_bytes'], 3),
+                 'calls': record['calls']}
+                for name, record in self.stages.items()
+            ],
+            'profiled_stage': self.profile_stage if self.profile is not None else None,
+            'profile': self.profile,
+        }, indent=2)
+
+def _megabytes(n_bytes, decimals):
+    return None if n_bytes is None else round(n_bytes / 1e6, decimals)
+
+def profile_report(profiler, limit=PROFILE_TOP_FUNCTIONS):
+    """The top functions of a cProfile run by cumulative time, as text"""
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(limit)
+    return output.getvalue()
@@ -0,0 +1,72 @@
+"""Histograms of each position's metric values, for distribution charts"""
+import numpy as np
+import pandas as pd
+
+from .ingest import restore_float64
+
+# Bins per histogram; the chart payload is bins x positions rows for any data size
+HISTOGRAM_BINS = 30
+
+HISTOGRAM_COLUMNS = ['Position', 'Bin Start', 'Bin End', 'Count', 'Share']
+
+
+def position_histograms(data, position_col, metric_col, bins=HISTOGRAM_BINS):
+    """Histogram of metric_col for every position plus 'ALL POSITIONS'
+
+    All positions share one set of equal-width bins over the metric's range,
+    so their charts are directly comparable. Every row is binned once and
+    counted per (position, bin) with a single bincount. Returns a DataFrame
+    with HISTOGRAM_COLUMNS, bins rows per position; Share is the fraction of
+    the position's tests in the bin.
+    """
+    values = restore_float64(data[metric_col]).to_numpy(dtype=float)
+    position_codes, positions = pd.factorize(data[position_col], sort=True)
+    present = ~np.isnan(values) & (position_codes >= 0)
+    values, position_codes = values[present], position_codes[present]
+
+    if len(values) == 0:
+        return pd.DataFrame(columns=HISTOGRAM_COLUMNS)
+    low, high = values.min(), values.max()
+    if low == high:
+        # One distinct value: a unit-wide range centred on it
+        low, high = low - 0.5, high + 0.5
+    edges = np.linspace(low, high, bins + 1)
+    # The last bin is closed on the right so the maximum is counted
+    bin_index = np.minimum(np.searchsorted(edges, values, side='right') - 1, bins - 1)
+
+    counts = np.bincount(position_codes * bins + bin_index, minlength=len(positions) * bins)
+    counts = counts.reshape(len(positions), bins)
+    counts = np.vstack([counts, counts.sum(axis=0)])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        shares = counts / counts.sum(axis=1, keepdims=True)
+
+    group_names = [str(position) for position in positions] + ['ALL POSITIONS']
+    return pd.DataFrame({
+        'Position': np.repeat(group_names, bins),
+        'Bin Start': np.tile(edges[:-1], len(group_names)),
+        'Bin End': np.tile(edges[1:], len(group_names)),
+        'Count': counts.ravel(),
+        'Share': shares.ravel(),
+    }, columns=HISTOGRAM_COLUMNS)
+
+def athlete_latest_value(individual_df, athlete, metric_col):
+    """(position, value) of the athlete's most recent test of metric_col, or None
+
+    Tests are ordered by Test Date when the results have one (undated tests
+    count as oldest), otherwise the last row counts as most recent.
+
+    >>> results = pd.DataFrame({'Athlete': ['A'] * 3, 'Position': ['QB'] * 3, 'Jump': [30.0, 45.0, 28.0],
+    ...                         'Test Date': ['2024-01-01', 'N/A', '2023-01-01']})
+    >>> athlete_latest_value(results, 'A', 'Jump')
+    ('QB', 30.0)
+    """
+    tests = individual_df[(individual_df['Athlete'] == athlete) & individual_df[metric_col].notna()]
+    if len(tests) == 0:
+        return None
+    if 'Test Date' in tests.columns:
+        test_dates = pd.to_datetime(tests['Test Date'], format='%Y-%m-%d', errors='coerce')
+        # argsort puts NaT last; undated tests must sort first
+        test_dates = test_dates.fillna(pd.Timestamp.min).to_numpy()
+        tests = tests.iloc[np.argsort(test_dates, kind='stable')]
+    latest = tests.iloc[-1]
+    return latest['Position'], float(latest[metric_col])
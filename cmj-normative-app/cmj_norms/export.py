@@ -0,0 +1,106 @@
+"""CSV and Excel exports of an analysis"""
+from io import BytesIO
+from pathlib import Path
+
+from openpyxl import Workbook
+
+from .ingest import restore_float64
+
+
+def sanitize_sheet_name(name, max_length=31):
+    """Sanitize string to be a valid Excel sheet name
+
+    Excel sheet name rules:
+    - Max 31 characters
+    - Cannot contain: \ / ? * [ ] :
+    - Cannot start or end with apostrophe
+    """
+    # Remove invalid characters
+    invalid_chars = ['\\', '/', '?', '*', '[', ']', ':']
+    for char in invalid_chars:
+        name = name.replace(char, '_')
+
+    # Remove leading/trailing apostrophes and spaces
+    name = name.strip().strip("'")
+
+    # Truncate to max length
+    if len(name) > max_length:
+        name = name[:max_length]
+
+    # Ensure not empty
+    if not name:
+        name = "Sheet"
+
+    return name
+
+def _sheet_rows(df):
+    """Yield the header and then each row of df as plain Python values
+
+    Missing values (NaN, NaT, None) become empty cells and float32 metrics
+    get back their exact values; columns are converted once each rather
+    than cell by cell.
+    """
+    yield [str(col) for col in df.columns]
+    columns = [restore_float64(df[col]) for col in df.columns]
+    columns = [values.astype(object).where(values.notna(), None).tolist() for values in columns]
+    yield from zip(*columns)
+
+def to_excel(dataframes_dict):
+    """Convert multiple dataframes to Excel file in memory
+
+    Uses openpyxl's write-only mode, which streams rows to the file instead
+    of building every cell object of the workbook first.
+    """
+    workbook = Workbook(write_only=True)
+    for sheet_name, df in dataframes_dict.items():
+        # Sanitize sheet name to ensure it's valid for Excel
+        worksheet = workbook.create_sheet(title=sanitize_sheet_name(sheet_name))
+        for row in _sheet_rows(df):
+            worksheet.append(row)
+    output = BytesIO()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+INDIVIDUAL_CSV_NAME = "cmj_individual_results.csv"
+EXCEL_FILE_NAME = "cmj_complete_analysis.xlsx"
+
+def normative_csv_name(metric_col):
+    """File name used for one metric's normative values CSV"""
+    return f"normative_values_{metric_col}.csv"
+
+def build_excel_sheets(individual_df, analysis_data, normative_dfs):
+    """Sheets of the complete analysis workbook, in order"""
+    excel_sheets = {'Individual Results': individual_df, 'Raw Data': analysis_data}
+    # Add each metric's normative table as a separate sheet
+    for metric_col, normative_df in normative_dfs.items():
+        # Create short sheet name to fit within 31 char limit (including 'Norms_' prefix)
+        # Truncate metric name to fit: 'Norms_' (6 chars) + metric name (25 chars max)
+        short_name = metric_col[:25] if len(metric_col) > 25 else metric_col
+        sheet_name = f'Norms_{short_name}'
+        excel_sheets[sheet_name] = normative_df
+    return excel_sheets
+
+def write_analysis_files(result, output_dir):
+    """Write the CSV and Excel files the app offers for download
+
+    Returns the list of paths written.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+
+    for metric_col, normative_df in result.normative_dfs.items():
+        path = output_dir / normative_csv_name(metric_col).replace('/', '_')
+        normative_df.to_csv(path, index=False)
+        written.append(path)
+
+    path = output_dir / INDIVIDUAL_CSV_NAME
+    result.individual_df.to_csv(path, index=False)
+    written.append(path)
+
+    path = output_dir / EXCEL_FILE_NAME
+    excel_sheets = build_excel_sheets(result.individual_df, result.analysis_data, result.normative_dfs)
+    path.write_bytes(to_excel(excel_sheets).getvalue())
+    written.append(path)
+    return written
@@ -0,0 +1,144 @@
+"""Persistent, append-only Parquet store of historical CMJ tests"""
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from .dates import detect_time_column, parse_test_timestamps
+from .ingest import SNIFF_SAMPLE_ROWS, test_keys
+
+# Persistent test history: an append-only directory of Parquet part files,
+# one per upload that contributed new rows
+HISTORY_STORE_DIR = Path(os.environ.get('CMJ_HISTORY_DIR', Path(__file__).resolve().parent.parent / 'cmj_history'))
+HISTORY_ROW_KEY = '_row_key'
+HISTORY_TEST_DATE = '_test_date'
+
+def history_row_keys(df, date_column=None):
+    """Key each test by its parsed identity (see test_keys) to skip already stored tests
+
+    Uploads are saved before the athlete column is chosen, so every text
+    column stands in for it. The same test keeps its key whether it was
+    exported as CSV or Excel.
+    """
+    return test_keys(df[[col for col in df.columns if col not in (HISTORY_ROW_KEY, HISTORY_TEST_DATE)]],
+                     None, date_column)
+
+def history_files(store_dir=HISTORY_STORE_DIR):
+    """List the store's Parquet part files in append order"""
+    return sorted(Path(store_dir).glob('part-*.parquet'))
+
+def history_dataset(store_dir=HISTORY_STORE_DIR):
+    """Open the store as one Arrow dataset, or None if nothing is stored yet
+
+    Part files written from different exports may disagree on dtypes (e.g. an
+    all-empty column), so their schemas are unified before reading. Raises
+    ValueError when a column's types cannot be unified.
+    """
+    files = history_files(store_dir)
+    if not files:
+        return None
+    try:
+        schema = pa.unify_schemas([pq.read_schema(f) for f in files], promote_options='permissive')
+    except (pa.ArrowTypeError, pa.ArrowInvalid) as e:
+        raise ValueError(
+            f"The test history in {store_dir} holds part files with conflicting column types ({e}). "
+            "Move its part files elsewhere to start a new history."
+        ) from e
+    return ds.dataset([str(f) for f in files], schema=schema, format='parquet')
+
+def append_to_history(df, store_dir=HISTORY_STORE_DIR, date_column=None):
+    """Append the rows of an export that are not already in the store
+
+    Returns the number of new rows written. Repeats within the export are
+    kept, as combine_exports keeps them. Only the stored row keys are read
+    to detect duplicates, so the cost scales with the uploaded file. The
+    date column is stored as parsed timestamps (with the time of its time
+    column) and the time column as text, so every part file has the same
+    types whether the export was CSV or Excel. Raises ValueError if the
+    stored part files conflict (see history_dataset).
+    """
+    keys = history_row_keys(df, date_column)
+    dataset = history_dataset(store_dir)
+    if dataset is not None:
+        stored_keys = dataset.to_table(columns=[HISTORY_ROW_KEY]).column(HISTORY_ROW_KEY).to_numpy()
+        is_new = ~np.isin(keys, stored_keys)
+    else:
+        is_new = np.ones(len(df), dtype=bool)
+
+    new_rows = df[is_new].assign(**{HISTORY_ROW_KEY: keys[is_new]})
+    if len(new_rows) == 0:
+        return 0
+
+    test_dates = pd.Series(pd.NaT, index=new_rows.index, dtype='datetime64[ns]')
+    if date_column is not None and date_column in new_rows.columns:
+        time_column = detect_time_column(new_rows, date_column)
+        try:
+            test_dates = parse_test_timestamps(new_rows, date_column, time_column).astype('datetime64[ns]')
+        except (ValueError, TypeError):
+            # Not dates after all: store the column as text
+            new_rows[date_column] = new_rows[date_column].astype('string')
+        else:
+            new_rows[date_column] = test_dates
+        if time_column is not None:
+            new_rows[time_column] = new_rows[time_column].astype('string')
+    new_rows[HISTORY_TEST_DATE] = test_dates
+
+    Path(store_dir).mkdir(parents=True, exist_ok=True)
+    part_name = f"part-{pd.Timestamp.now(tz='UTC'):%Y%m%dT%H%M%S%f}-{keys[is_new][0]:016x}.parquet"
+    pq.write_table(pa.Table.from_pandas(new_rows, preserve_index=False), Path(store_dir) / part_name)
+    return len(new_rows)
+
+def _stored_columns(dataset):
+    return [name for name in dataset.schema.names if name not in (HISTORY_ROW_KEY, HISTORY_TEST_DATE)]
+
+def sample_history(store_dir=HISTORY_STORE_DIR, n_rows=SNIFF_SAMPLE_ROWS):
+    """The first stored tests and the number of stored tests
+
+    Returns (sample, count), or (None, 0) when the store is empty. Like
+    sniff_cmj_columns for an upload, the sample is enough to configure the
+    analysis; the count comes from the Parquet metadata.
+    """
+    dataset = history_dataset(store_dir)
+    if dataset is None:
+        return None, 0
+    return dataset.head(n_rows, columns=_stored_columns(dataset)).to_pandas(), dataset.count_rows()
+
+def read_history(store_dir=HISTORY_STORE_DIR, columns=None, start=None, end=None, years=None):
+    """Read stored tests, optionally only some columns and test dates
+
+    start and end select tests dated from start through the whole of end,
+    years the tests from those calendar years; tests without a parsed date
+    are left out of either. Column projection and the date filter are
+    pushed down to the Parquet reader, so unrequested columns and row
+    groups are never decoded. The internal row key and test date columns
+    are dropped from the result.
+    """
+    dataset = history_dataset(store_dir)
+    if dataset is None:
+        return None
+
+    test_date = ds.field(HISTORY_TEST_DATE)
+    date_filter = None
+    if start is not None:
+        date_filter = test_date >= pd.Timestamp(start).normalize()
+    if end is not None:
+        end_filter = test_date < pd.Timestamp(end).normalize() + pd.Timedelta(days=1)
+        date_filter = end_filter if date_filter is None else date_filter & end_filter
+    if years is not None:
+        years_filter = ds.scalar(False)
+        for year in years:
+            years_filter = years_filter | ((test_date >= pd.Timestamp(year=int(year), month=1, day=1))
+                                           & (test_date < pd.Timestamp(year=int(year) + 1, month=1, day=1)))
+        date_filter = years_filter if date_filter is None else date_filter & years_filter
+
+    if columns is None:
+        columns = _stored_columns(dataset)
+    return dataset.to_table(columns=list(columns), filter=date_filter).to_pandas()
+
+def history_version(store_dir=HISTORY_STORE_DIR):
+    """Identify the store's current contents for cache keys"""
+    return tuple((f.name, f.stat().st_size) for f in history_files(store_dir))
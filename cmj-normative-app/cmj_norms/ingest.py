@@ -0,0 +1,302 @@
+"""Loading CMJ exports and rosters and detecting their key columns"""
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .dates import detect_time_column, parse_dates, parse_test_timestamps
+
+# ForceDecks writes asymmetry as "<percent> <side>", e.g. "9.4 L" or "7.6 R"
+ASYMMETRY_PATTERN = r'^\s*(\d+(?:\.\d+)?)\s*([LR]?)\s*$'
+# Suffix of the unsigned column added next to each converted asymmetry column
+ASYMMETRY_MAGNITUDE_SUFFIX = ' (Magnitude)'
+# Non-missing values checked when detecting asymmetry columns
+ASYMMETRY_SAMPLE_SIZE = 200
+
+# Rows read to infer the columns and their types before the full load
+SNIFF_SAMPLE_ROWS = 1_000
+
+# Column telling apart tests of different types taken at the same time
+TEST_TYPE_COLUMN = 'Test Type'
+# Columns of the report of combined uploads
+UPLOAD_REPORT_COLUMNS = ['File', 'Tests', 'Duplicates Dropped']
+
+# Text columns with at most this fraction of distinct values are stored as
+# categoricals (names, positions, test types, tags, dates)
+CATEGORY_MAX_UNIQUE_FRACTION = 0.5
+# Most decimals a metric may have for float32 to be considered
+FLOAT32_MAX_DECIMALS = 6
+
+
+def load_data(file, usecols=None, nrows=None):
+    """Load data from CSV or Excel file
+
+    Accepts an uploaded file object (with a .name) or a filesystem path.
+    usecols limits the columns read to those names (after stripping
+    whitespace); nrows limits the rows.
+    """
+    if file is not None:
+        file_name = str(getattr(file, 'name', file))
+        if usecols is not None:
+            wanted = set(usecols)
+            usecols = lambda col: str(col).strip() in wanted
+        if file_name.endswith('.csv'):
+            df = pd.read_csv(file, usecols=usecols, nrows=nrows)
+        else:
+            df = pd.read_excel(file, usecols=usecols, nrows=nrows)
+
+        # Strip whitespace from column names
+        df.columns = df.columns.str.strip()
+        return convert_asymmetry_columns(df)
+    return None
+
+def load_files(files, usecols=None, workers=None):
+    """Load several files with load_data in a thread pool, in the order given"""
+    if len(files) == 1:
+        return [load_data(files[0], usecols=usecols)]
+    workers = workers or min(len(files), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda file: load_data(file, usecols=usecols), files))
+
+def row_hashes(df, columns=None):
+    """Hash each row's values in columns (default all) into a 64-bit key
+
+    Columns are hashed in name order with numbers as float64 and everything
+    else as text, so the same test hashes identically across exports even if
+    column order or inferred dtypes differ.
+    """
+    columns = sorted(df.columns if columns is None else columns)
+    normalized = pd.DataFrame({
+        col: df[col].astype('float64') if pd.api.types.is_numeric_dtype(df[col])
+        else df[col].astype('string').fillna('')
+        for col in columns
+    })
+    return pd.util.hash_pandas_object(normalized, index=False).values
+
+def test_keys(df, athlete_col, date_column=None):
+    """Hash each test's identity into a 64-bit key (see row_hashes)
+
+    The identity is the athlete, the test time, the test type and every
+    numeric column, whichever metrics are analysed. The date (with its time
+    column, if any) is parsed to a timestamp first, so a test keeps its key
+    whether its export held dates as text (CSV) or as timestamps (Excel).
+    With athlete_col None, every text column stands in for the athlete.
+    """
+    identity = df[[col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]]
+    text_columns = get_text_columns(df) if athlete_col is None else [athlete_col, TEST_TYPE_COLUMN]
+    identity = identity.assign(**{col: df[col] for col in text_columns if col in df.columns})
+    if date_column in df.columns:
+        time_column = detect_time_column(df, date_column)
+        try:
+            test_times = parse_test_timestamps(df, date_column, time_column)
+        except (ValueError, TypeError):
+            # Not dates after all: compare the values as written
+            test_times = df[date_column]
+        identity = identity.drop(columns=[date_column, time_column], errors='ignore')
+        identity[date_column] = test_times
+    return row_hashes(identity)
+
+def repeated_tests(frames, athlete_col, date_column=None):
+    """Mark the tests (in concatenated order) already present in an earlier frame
+
+    Overlapping exports repeat whole tests, so a test is repeated when one
+    with the same test_keys came from an earlier frame. Repeats within one
+    frame are not marked, as a single upload would keep them. The frames
+    should hold every column of their file, so the result does not depend on
+    the columns later loaded for the analysis.
+    """
+    keys = np.concatenate([test_keys(frame, athlete_col, date_column) for frame in frames])
+    file_index = np.repeat(np.arange(len(frames)), [len(frame) for frame in frames])
+    key_codes, unique_keys = pd.factorize(keys)
+    # First file each test appears in
+    first_file = np.full(len(unique_keys), len(frames))
+    np.minimum.at(first_file, key_codes, file_index)
+    return file_index > first_file[key_codes]
+
+def combine_exports(frames, file_names, repeated=None):
+    """Concatenate exports and drop the tests marked repeated
+
+    repeated is the result of repeated_tests for the same files (unused for
+    a single file). A column that one file holds as timestamps (Excel) and
+    another as text (CSV) is parsed to timestamps in all of them. Returns
+    (data, report) with one report row per file (UPLOAD_REPORT_COLUMNS).
+    """
+    if len(frames) == 1:
+        return frames[0], pd.DataFrame([[file_names[0], len(frames[0]), 0]], columns=UPLOAD_REPORT_COLUMNS)
+    timestamp_columns = {col for frame in frames for col in frame.columns
+                         if pd.api.types.is_datetime64_any_dtype(frame[col])}
+    data = pd.concat([
+        frame.assign(**{col: parse_dates(frame[col]) for col in timestamp_columns if col in frame.columns})
+        for frame in frames
+    ], ignore_index=True)
+    file_index = np.repeat(np.arange(len(frames)), [len(frame) for frame in frames])
+    report = pd.DataFrame({
+        'File': file_names,
+        'Tests': [len(frame) for frame in frames],
+        'Duplicates Dropped': np.bincount(file_index[repeated], minlength=len(frames)),
+    }, columns=UPLOAD_REPORT_COLUMNS)
+    return data[~repeated].reset_index(drop=True), report
+
+def sniff_data(file, nrows=SNIFF_SAMPLE_ROWS):
+    """Header and first nrows rows of a file, parsed as load_data would
+
+    Enough to offer the columns and infer their types without parsing the
+    whole file. Excel sheets are opened read-only and stop after nrows rows,
+    so a large workbook sniffs in a fraction of its full load time. A column
+    whose later rows hold text can still load as non-numeric.
+    """
+    return load_data(file, nrows=nrows)
+
+def source_columns(df, columns):
+    """Columns of the file that load_data(usecols=...) must read to produce columns
+
+    df is data as loaded (e.g. a sniffed sample); an asymmetry magnitude
+    column is read through its source column. Returns them in df's order.
+    """
+    wanted = set(columns)
+    wanted |= {col[:-len(ASYMMETRY_MAGNITUDE_SUFFIX)] for col in columns if col.endswith(ASYMMETRY_MAGNITUDE_SUFFIX)}
+    return [col for col in df.columns if col in wanted]
+
+def file_digest(file):
+    """Return the SHA-256 hex digest of a file's contents
+
+    Accepts an uploaded file object or a filesystem path.
+    """
+    if hasattr(file, 'getvalue'):
+        return hashlib.sha256(file.getvalue()).hexdigest()
+    return hashlib.sha256(Path(file).read_bytes()).hexdigest()
+
+def detect_asymmetry_columns(df):
+    """List text columns holding ForceDecks asymmetry values like "9.4 L"
+
+    A bounded sample of each text column must match "<number> <L|R>"
+    (the side may be missing for 0), with at least one side given.
+    """
+    asymmetry_columns = []
+    for col in get_text_columns(df):
+        sample = df[col].dropna().astype(str).head(ASYMMETRY_SAMPLE_SIZE)
+        if len(sample) == 0:
+            continue
+        sides = sample.str.extract(ASYMMETRY_PATTERN)[1]
+        if sides.notna().all() and (sides != '').any():
+            asymmetry_columns.append(col)
+    return asymmetry_columns
+
+def convert_asymmetry_columns(df, columns=None):
+    """Turn asymmetry strings into numbers the norms and ranks can use
+
+    Each column becomes a signed percentage (L negative, R positive) and an
+    unsigned '<column> (Magnitude)' column is added right after it. Values
+    that don't match are left missing. columns defaults to
+    detect_asymmetry_columns(df); returns df unchanged when there are none.
+    """
+    if columns is None:
+        columns = detect_asymmetry_columns(df)
+    if not columns:
+        return df
+
+    converted = {}
+    for col in df.columns:
+        if col not in columns:
+            converted[col] = df[col]
+            continue
+        # Exports repeat a few thousand distinct strings at most, so parse
+        # each distinct value once and broadcast back by factorized code
+        codes, uniques = pd.factorize(df[col])
+        parts = pd.Series(uniques, dtype='string').str.extract(ASYMMETRY_PATTERN)
+        unique_magnitude = pd.to_numeric(parts[0]).to_numpy(dtype=float, na_value=np.nan)
+        unique_signed = np.where((parts[1] == 'L').fillna(False), -unique_magnitude, unique_magnitude)
+        # Code -1 marks missing values; append a NaN for them to index
+        magnitude = np.append(unique_magnitude, np.nan)[codes]
+        converted[col] = pd.Series(np.append(unique_signed, np.nan)[codes], index=df.index)
+        converted[f'{col}{ASYMMETRY_MAGNITUDE_SUFFIX}'] = pd.Series(magnitude, index=df.index)
+    return pd.DataFrame(converted, index=df.index)
+
+def _float32_preserves(values):
+    """True if every value survives float32 at the column's own precision
+
+    The precision is the fewest decimals (up to FLOAT32_MAX_DECIMALS) that
+    represent all values; float32 is lossless if rounding its values back to
+    that many decimals gives the originals. Order and ties are then kept too.
+    """
+    values = values.to_numpy(dtype=float, na_value=np.nan)
+    finite = values[np.isfinite(values)]
+    for decimals in range(FLOAT32_MAX_DECIMALS + 1):
+        if np.array_equal(np.round(finite, decimals), finite):
+            return np.array_equal(np.round(finite.astype(np.float32).astype(float), decimals), finite)
+    return False
+
+def restore_float64(values):
+    """Exact float64 values of a metric stored as float32 by compact_schema
+
+    Rounds to the fewest decimals that map back onto the stored float32
+    values, which recovers the original numbers. Other dtypes are returned
+    as they are.
+    """
+    if values.dtype != np.float32:
+        return values
+    widened = values.astype(float)
+    for decimals in range(FLOAT32_MAX_DECIMALS + 1):
+        rounded = widened.round(decimals)
+        if rounded.astype(np.float32).equals(values):
+            return rounded
+    return widened
+
+def compact_schema(df):
+    """Smaller in-memory copy of a CMJ export
+
+    Repetitive text columns become categoricals and float64 metrics become
+    float32 wherever no value changes at the column's precision. Column data
+    that is already compact is shared, not copied.
+    """
+    text_columns = set(get_text_columns(df))
+    compact = {}
+    for col in df.columns:
+        values = df[col]
+        if values.dtype == np.float64 and _float32_preserves(values):
+            values = values.astype(np.float32)
+        elif col in text_columns and values.nunique() <= CATEGORY_MAX_UNIQUE_FRACTION * len(values):
+            values = values.astype('category')
+        compact[col] = values
+    return pd.DataFrame(compact, index=df.index)
+
+def memory_footprint(df):
+    """Bytes used by df, including the contents of text columns"""
+    return int(df.memory_usage(deep=True).sum())
+
+def get_numeric_columns(df):
+    """Get list of numeric columns from dataframe"""
+    return df.select_dtypes(include=[np.number]).columns.tolist()
+
+def get_text_columns(df):
+    """Get list of text/object columns from dataframe (including categoricals)"""
+    return df.select_dtypes(include=['object', 'string', 'category']).columns.tolist()
+
+def detect_athlete_column(cmj_data, roster_data):
+    """Guess the athlete ID column
+
+    A column present in both files is almost always the athlete ID; otherwise
+    fall back to the first text column of the CMJ data.
+    """
+    common_cols = list(set(cmj_data.columns) & set(roster_data.columns))
+    cmj_text_cols = get_text_columns(cmj_data)
+    return common_cols[0] if common_cols else (cmj_text_cols[0] if cmj_text_cols else cmj_data.columns[0])
+
+def detect_position_column(roster_data):
+    """Guess the position column: the first roster column named like 'position'"""
+    position_candidates = [col for col in roster_data.columns if 'position' in col.lower()]
+    roster_text_cols = get_text_columns(roster_data)
+    return position_candidates[0] if position_candidates else (roster_text_cols[1] if len(roster_text_cols) > 1 else (roster_text_cols[0] if roster_text_cols else roster_data.columns[-1]))
+
+def detect_date_columns(df):
+    """List columns whose names suggest a date, time or year"""
+    return [col for col in df.columns if any(word in col.lower() for word in ['date', 'time', 'year'])]
+
+def default_metric_columns(cmj_data):
+    """Metric options (numeric columns) and the default selection (first 3)"""
+    cmj_numeric_cols = get_numeric_columns(cmj_data)
+    metric_options = cmj_numeric_cols if cmj_numeric_cols else cmj_data.columns.tolist()
+    return metric_options, metric_options[:min(3, len(metric_options))]
@@ -0,0 +1,111 @@
+"""Rolling baselines: each test ranked against recent tests instead of the whole dataset"""
+from bisect import bisect_left, insort
+
+import numpy as np
+import pandas as pd
+
+# Defaults: an athlete's own previous tests, and the position's trailing days
+ATHLETE_BASELINE_TESTS = 10
+POSITION_BASELINE_DAYS = 90
+# Fewest earlier tests a baseline needs; with fewer the rank is left empty
+MIN_BASELINE_TESTS = 3
+
+
+def athlete_baseline_column(metric_col, last_n=ATHLETE_BASELINE_TESTS):
+    """Name of the column ranking metric_col against the athlete's last tests"""
+    return f'{metric_col}_Percentile (Last {last_n} Tests)'
+
+def position_baseline_column(metric_col, window_days=POSITION_BASELINE_DAYS):
+    """Name of the column ranking metric_col against the position's trailing days"""
+    return f'{metric_col}_Percentile (Position {window_days}d)'
+
+def _athlete_baseline_ranks(groups, times, values, last_n, min_tests):
+    """Rank each value against the last_n values of its group from strictly earlier times
+
+    groups, times and values are sorted by group then time. The window is
+    the (rows x lag) matrix of lagged values, so every row's window is built
+    by array shifts rather than a slice per test. Tests sharing a time (e.g.
+    day-level dates) are left out of each other's windows: a test that is
+    offset rows into its run of equal times uses lags offset+1 to
+    offset+last_n.
+    """
+    n = len(values)
+    new_run = np.r_[True, (groups[1:] != groups[:-1]) | (times[1:] != times[:-1])]
+    offset = np.arange(n) - np.maximum.accumulate(np.where(new_run, np.arange(n), 0))
+    below = np.zeros(n)
+    window_size = np.zeros(n)
+    for lag in range(1, min(last_n + offset.max(initial=0), n - 1) + 1):
+        in_window = (groups[lag:] == groups[:-lag]) & (offset[lag:] < lag) & (lag <= offset[lag:] + last_n)
+        below[lag:] += in_window & (values[:-lag] < values[lag:])
+        window_size[lag:] += in_window
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ranks = below / window_size * 100
+    return np.where(window_size >= min_tests, ranks, np.nan)
+
+def _trailing_window_ranks(times, values, window, min_tests):
+    """Rank each value against the values of the preceding time window
+
+    times (int64 ns) and values are sorted by time. The window holds values
+    with times in [t - window, t) in sorted order; it slides forward with
+    one insert per test entering and one removal per test leaving, so each
+    test costs a binary search rather than a pass over the window.
+    """
+    ranks = np.full(len(values), np.nan)
+    window_values = []
+    start = end = 0
+    for i, (time, value) in enumerate(zip(times, values)):
+        while end < i and times[end] < time:
+            insort(window_values, values[end])
+            end += 1
+        while start < end and times[start] < time - window:
+            del window_values[bisect_left(window_values, values[start])]
+            start += 1
+        if len(window_values) >= min_tests:
+            ranks[i] = bisect_left(window_values, value) / len(window_values) * 100
+    return ranks
+
+def calculate_rolling_percentiles(data, athlete_col, position_col, metric_cols, timestamps,
+                                  last_n=ATHLETE_BASELINE_TESTS, window_days=POSITION_BASELINE_DAYS,
+                                  min_tests=MIN_BASELINE_TESTS):
+    """Percentile rank of each test against two rolling baselines
+
+    - the athlete's own previous last_n tests
+    - tests by the same position in the window_days before the test
+
+    Ranks use the same rule as calculate_percentile_ranks (share of the
+    baseline strictly below the test, 0-100), counting only earlier tests.
+    Tests without a timestamp, or with fewer than min_tests in a baseline,
+    get no rank. Returns a DataFrame aligned with data, two columns per
+    metric (see athlete_baseline_column / position_baseline_column).
+    """
+    timestamps = pd.Series(pd.to_datetime(timestamps), index=data.index)
+    dated = timestamps.notna().to_numpy()
+    times = timestamps.to_numpy(dtype='datetime64[ns]')[dated].astype(np.int64)
+    athletes = pd.factorize(data[athlete_col])[0][dated]
+    positions = pd.factorize(data[position_col])[0][dated]
+    window = pd.Timedelta(days=window_days).value
+
+    # One sort by (athlete, time) and one by (position, time) serve every metric
+    athlete_order = np.lexsort((times, athletes))
+    position_order = np.lexsort((times, positions))
+    position_bounds = np.flatnonzero(np.diff(positions[position_order])) + 1
+
+    rolling = {}
+    for metric_col in metric_cols:
+        values = data[metric_col].to_numpy(dtype=float)[dated]
+
+        athlete_ranks = np.empty(len(values))
+        athlete_ranks[athlete_order] = _athlete_baseline_ranks(
+            athletes[athlete_order], times[athlete_order], values[athlete_order], last_n, min_tests
+        )
+
+        position_ranks = np.empty(len(values))
+        for rows in np.split(position_order, position_bounds):
+            position_ranks[rows] = _trailing_window_ranks(times[rows], values[rows], window, min_tests)
+
+        for column, ranks in ((athlete_baseline_column(metric_col, last_n), athlete_ranks),
+                              (position_baseline_column(metric_col, window_days), position_ranks)):
+            full = np.full(len(data), np.nan)
+            full[dated] = ranks
+            rolling[column] = np.round(full, 2)
+    return pd.DataFrame(rolling, index=data.index)
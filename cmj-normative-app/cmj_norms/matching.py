@@ -0,0 +1,159 @@
+"""Matching CMJ athlete names to the roster despite formatting differences"""
+import difflib
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# Split name columns recognised in either file (compared in lower case)
+FIRST_NAME_COLUMNS = ['first name', 'firstname', 'first', 'given name', 'fname']
+LAST_NAME_COLUMNS = ['last name', 'lastname', 'last', 'surname', 'lname']
+# Column added when split names are combined
+FULL_NAME_COLUMN = 'Full Name'
+
+# Name tokens ignored when matching, as long as two other name tokens remain
+NAME_SUFFIXES = {'jr', 'sr', 'ii', 'iii', 'iv', 'v'}
+# Lowest similarity (0-1) accepted for a fuzzy match
+FUZZY_MATCH_CUTOFF = 0.85
+# A fuzzy match is ambiguous, and left unmatched, when the runner-up roster
+# name is at most this much less similar than the best one
+FUZZY_MATCH_MARGIN = 0.05
+
+# Columns of the match report, one row per distinct CMJ name
+MATCH_REPORT_COLUMNS = ['CMJ Name', 'Roster Name', 'Match', 'Confidence', 'Tests']
+
+
+def detect_name_columns(df):
+    """Return the (first, last) name columns of df, or None if it has no split names"""
+    lower = {col.lower(): col for col in df.columns}
+    first = next((lower[name] for name in FIRST_NAME_COLUMNS if name in lower), None)
+    last = next((lower[name] for name in LAST_NAME_COLUMNS if name in lower), None)
+    return (first, last) if first and last else None
+
+def combine_name_columns(df):
+    """Add a FULL_NAME_COLUMN ("First Last") when df has split name columns
+
+    Returns (df, combined) where combined tells whether the column was added.
+    """
+    name_columns = detect_name_columns(df)
+    if name_columns is None or FULL_NAME_COLUMN in df.columns:
+        return df, False
+    first, last = (df[col].astype('string').str.strip() for col in name_columns)
+    return df.assign(**{FULL_NAME_COLUMN: (first + ' ' + last).astype(object)}), True
+
+def roster_with_athlete_column(roster_data, athlete_id_column):
+    """Use the roster's combined FULL_NAME_COLUMN as athlete_id_column if it lacks one
+
+    Lets a CMJ export with one name column ("Athlete Name") match a roster
+    with split first/last names.
+    """
+    if athlete_id_column in roster_data.columns or FULL_NAME_COLUMN not in roster_data.columns:
+        return roster_data
+    return roster_data.rename(columns={FULL_NAME_COLUMN: athlete_id_column})
+
+def normalize_names(names):
+    """Matching key for each name: accent-free lower case tokens, sorted
+
+    Periods, apostrophes and hyphens are dropped ("Amon-Ra" -> "amonra"),
+    other punctuation separates tokens and suffixes (Jr, III...) are
+    ignored, so "Smith Jr., John", "john  smith" and "JOHN SMITH" share the
+    key "john smith". Suffixes are kept when fewer than two other tokens
+    remain, so an initial like the "V" of "V Jones" is not dropped. Missing
+    names get an empty key.
+    """
+    keys = (pd.Series(names, dtype='string').fillna('')
+            .str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('ascii')
+            .str.lower()
+            .str.replace(r"[.'`-]", '', regex=True)
+            .str.replace(r'[^a-z0-9]+', ' ', regex=True)
+            .str.split())
+    return np.array([' '.join(sorted(_without_suffixes(tokens))) for tokens in keys], dtype=object)
+
+def _without_suffixes(tokens):
+    name_tokens = [token for token in tokens if token not in NAME_SUFFIXES]
+    return name_tokens if len(name_tokens) >= 2 else tokens
+
+def _blocks(key):
+    """Blocking labels of a key: the first three letters of each token
+
+    Fuzzy candidates must share one, so a typo is tolerated as long as one
+    name part starts the same.
+    """
+    return {token[:3] for token in key.split()}
+
+def match_names(cmj_names, roster_names, cutoff=FUZZY_MATCH_CUTOFF):
+    """Resolve each distinct CMJ name to a roster name
+
+    Exact names are found by hash lookup, then names whose normalized keys
+    are equal, and only the rest are compared fuzzily (difflib similarity of
+    the keys) against roster names sharing the start of a name part. When
+    the two most similar roster names are within FUZZY_MATCH_MARGIN of each
+    other the name is 'ambiguous' and left unmatched. Returns the match
+    report: one row per distinct CMJ name with the roster name it resolves
+    to, how it was matched ('exact', 'normalized', 'fuzzy', 'ambiguous' or
+    'unmatched'), a confidence from 0 to 1 (for an ambiguous name, the
+    similarity of the best candidate) and the number of tests with that name.
+    """
+    cmj_counts = pd.Series(cmj_names).value_counts(sort=False)
+    # Categorical names also count categories with no tests
+    cmj_counts = cmj_counts[cmj_counts > 0]
+    cmj_unique = cmj_counts.index.to_numpy(dtype=object)
+    roster_unique = pd.unique(pd.Series(roster_names).dropna())
+
+    roster_set = set(roster_unique)
+    cmj_keys = normalize_names(cmj_unique)
+    roster_keys = normalize_names(roster_unique)
+    # First roster name wins when several share a key
+    key_index = {}
+    for key, name in zip(roster_keys, roster_unique):
+        if key:
+            key_index.setdefault(key, name)
+    block_index = defaultdict(set)
+    for key in key_index:
+        for block in _blocks(key):
+            block_index[block].add(key)
+
+    roster_matches, methods, confidences = [], [], []
+    for name, key in zip(cmj_unique, cmj_keys):
+        if name in roster_set:
+            match, method, confidence = name, 'exact', 1.0
+        elif key in key_index:
+            match, method, confidence = key_index[key], 'normalized', 1.0
+        else:
+            candidates = sorted(set().union(*(block_index[block] for block in _blocks(key)))) if key else []
+            # Runners-up slightly below the cutoff can still make the best match ambiguous
+            close = difflib.get_close_matches(key, candidates, n=2, cutoff=cutoff - FUZZY_MATCH_MARGIN)
+            scores = [difflib.SequenceMatcher(None, key, candidate).ratio() for candidate in close]
+            if not scores or scores[0] < cutoff:
+                match, method, confidence = None, 'unmatched', 0.0
+            elif len(scores) > 1 and scores[0] - scores[1] <= FUZZY_MATCH_MARGIN:
+                match, method, confidence = None, 'ambiguous', scores[0]
+            else:
+                match, method, confidence = key_index[close[0]], 'fuzzy', scores[0]
+        roster_matches.append(match)
+        methods.append(method)
+        confidences.append(round(confidence, 3))
+
+    return pd.DataFrame({
+        'CMJ Name': cmj_unique,
+        'Roster Name': roster_matches,
+        'Match': methods,
+        'Confidence': confidences,
+        'Tests': cmj_counts.to_numpy(),
+    }, columns=MATCH_REPORT_COLUMNS)
+
+def resolve_roster_names(cmj_data, roster_data, athlete_id_column, cutoff=FUZZY_MATCH_CUTOFF):
+    """Rename CMJ athletes to their matched roster spelling before the merge
+
+    Returns (cmj_data, match_report); unmatched names are left unchanged.
+    """
+    report = match_names(cmj_data[athlete_id_column].dropna(), roster_data[athlete_id_column], cutoff)
+    if not report['Match'].isin(['normalized', 'fuzzy']).any():
+        return cmj_data, report
+    # Map every name (to itself when unchanged); categorical columns only map their categories
+    mapping = dict(zip(report['CMJ Name'], report['Roster Name'].fillna(report['CMJ Name'])))
+    athletes = cmj_data[athlete_id_column]
+    resolved = athletes.map(mapping)
+    if isinstance(athletes.dtype, pd.CategoricalDtype) and not isinstance(resolved.dtype, pd.CategoricalDtype):
+        resolved = resolved.astype('category')
+    return cmj_data.assign(**{athlete_id_column: resolved}), report
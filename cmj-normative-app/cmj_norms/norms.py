@@ -0,0 +1,124 @@
+"""Position normative tables and within-position percentile ranks"""
+import numpy as np
+import pandas as pd
+
+from .dates import DATE_FORMATS, detect_format
+from .ingest import restore_float64
+
+
+def calculate_percentiles(data, metric_col):
+    """Calculate percentile values for the data"""
+    return {
+        'P25': np.percentile(data[metric_col].dropna(), 25),
+        'P50': np.percentile(data[metric_col].dropna(), 50),
+        'P75': np.percentile(data[metric_col].dropna(), 75),
+        'P90': np.percentile(data[metric_col].dropna(), 90),
+        'Mean': data[metric_col].mean(),
+        'SD': data[metric_col].std(),
+        'Min': data[metric_col].min(),
+        'Max': data[metric_col].max(),
+        'N': data[metric_col].notna().sum()
+    }
+
+# Performance categories by within-position percentile rank, best first: (lowest rank, label)
+PERFORMANCE_CATEGORIES = [(90, 'Elite'), (75, 'Above Average'), (25, 'Average'), (0, 'Below Average')]
+
+NORMATIVE_COLUMNS = ['Position', 'P25', 'P50 (Median)', 'P75', 'P90', 'Mean', 'SD', 'Min', 'Max', 'N']
+
+def _summarize_norms(quantiles, stats):
+    """Assemble one metric's normative table from quantile and summary frames
+
+    Both frames are indexed by position; columns are the statistics.
+    """
+    norms = pd.DataFrame({
+        'Position': quantiles.index,
+        'P25': quantiles[0.25].values,
+        'P50 (Median)': quantiles[0.5].values,
+        'P75': quantiles[0.75].values,
+        'P90': quantiles[0.9].values,
+        'Mean': stats['mean'].values,
+        'SD': stats['std'].values,
+        'Min': stats['min'].values,
+        'Max': stats['max'].values,
+    }).round(2)
+    norms['N'] = stats['count'].values.astype(int)
+    return norms
+
+def calculate_position_norms(data, position_col, metric_cols):
+    """Calculate normative tables for every position and metric at once
+
+    Returns a dict of metric -> DataFrame with one row per position (sorted)
+    plus an 'ALL POSITIONS' row, matching calculate_percentiles applied per
+    position. All positions and metrics share one grouped quantile pass and
+    one grouped aggregation pass.
+    """
+    quantile_levels = [0.25, 0.5, 0.75, 0.9]
+    summary_stats = ['mean', 'std', 'min', 'max', 'count']
+
+    # Statistics are computed on the exact values of float32-stored metrics
+    data = data[[position_col]].assign(**{col: restore_float64(data[col]) for col in metric_cols})
+    grouped = data.groupby(position_col, observed=True)[metric_cols]
+    # Rows: (position, quantile level); columns: metrics
+    position_quantiles = grouped.quantile(quantile_levels)
+    # Columns: (metric, statistic)
+    position_stats = grouped.agg(summary_stats)
+
+    overall_quantiles = data[metric_cols].quantile(quantile_levels)
+    overall_stats = data[metric_cols].agg(summary_stats)
+
+    normative_dfs = {}
+    for metric_col in metric_cols:
+        norms = _summarize_norms(
+            position_quantiles[metric_col].unstack(),
+            position_stats[metric_col]
+        )
+        overall = _summarize_norms(
+            overall_quantiles[[metric_col]].T.rename(index={metric_col: 'ALL POSITIONS'}),
+            overall_stats[[metric_col]].T
+        )
+        normative_dfs[metric_col] = pd.concat([norms, overall], ignore_index=True)[NORMATIVE_COLUMNS]
+    return normative_dfs
+
+def calculate_percentile_ranks(data, group_col, metric_cols):
+    """Calculate within-group percentile ranks for every row and metric at once
+
+    A row's percentile is the share of non-missing values in its group that are
+    strictly less than the row's value (0-100, rounded to 2 decimals). Each
+    group is ranked once per metric with a sort-based rank instead of scanning
+    the group for every row.
+    """
+    grouped = data.groupby(group_col, sort=False, observed=True)[metric_cols]
+    # Minimum rank of ties minus one == number of values strictly below
+    below = grouped.rank(method='min') - 1
+    group_sizes = grouped.transform('count')
+    ranks = (below / group_sizes * 100).round(2)
+    ranks.columns = [f'{col}_Percentile' for col in metric_cols]
+    return ranks
+
+def performance_category(percentiles):
+    """Performance category of each percentile rank (see PERFORMANCE_CATEGORIES)
+
+    Elite is P90 and above, Above Average P75-P90, Average P25-P75 and
+    Below Average under P25. Missing ranks get None.
+    """
+    percentiles = np.asarray(percentiles, dtype=float)
+    categories = np.select([percentiles >= low for low, _ in PERFORMANCE_CATEGORIES],
+                           [label for _, label in PERFORMANCE_CATEGORIES], default=None)
+    return categories.astype(object)
+
+def format_test_dates(dates):
+    """Format a date column as YYYY-MM-DD strings
+
+    Values that cannot be parsed are kept as their string form and missing
+    values are shown as 'N/A'.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        parsed = dates
+    else:
+        # One detected format for the whole column instead of per-value inference
+        fmt = detect_format(dates, DATE_FORMATS)
+        parsed = pd.to_datetime(dates.astype(str).str.strip() if fmt else dates, format=fmt, errors='coerce')
+    formatted = parsed.dt.strftime('%Y-%m-%d')
+    unparsed = parsed.isna() & dates.notna()
+    formatted[unparsed] = dates[unparsed].astype(str)
+    return formatted.fillna('N/A')
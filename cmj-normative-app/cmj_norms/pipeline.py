@@ -0,0 +1,211 @@
+"""End-to-end analysis: validate, filter, merge, norm and rank"""
+from dataclasses import dataclass
+
+import pandas as pd
+
+from .dates import DateIndexedData
+from .ingest import detect_date_columns, restore_float64
+from .longitudinal import (ATHLETE_BASELINE_TESTS, POSITION_BASELINE_DAYS, athlete_baseline_column,
+                           calculate_rolling_percentiles, position_baseline_column)
+from .matching import resolve_roster_names, roster_with_athlete_column
+from .norms import calculate_percentile_ranks, calculate_position_norms, format_test_dates
+from .screening import exclude_outliers
+
+
+@dataclass
+class AnalysisResult:
+    """Everything the app displays and exports for one CMJ export and roster"""
+    merged_data: pd.DataFrame
+    no_position: pd.DataFrame
+    analysis_data: pd.DataFrame
+    normative_dfs: dict
+    individual_df: pd.DataFrame
+    positions: list
+    name_matches: pd.DataFrame = None
+
+def validate_columns(cmj_data, roster_data, athlete_id_column, position_column, metric_columns):
+    """Return a list of problems that prevent analysis (empty when valid)"""
+    errors = []
+    if athlete_id_column not in cmj_data.columns:
+        errors.append(f"Column '{athlete_id_column}' not found in CMJ data")
+    for metric_col in metric_columns:
+        if metric_col not in cmj_data.columns:
+            errors.append(f"Column '{metric_col}' not found in CMJ data")
+        elif not pd.api.types.is_numeric_dtype(cmj_data[metric_col]):
+            errors.append(f"Column '{metric_col}' must contain numeric values (current data type: {cmj_data[metric_col].dtype})")
+    if athlete_id_column not in roster_data.columns:
+        errors.append(f"Column '{athlete_id_column}' not found in Roster data")
+    if position_column not in roster_data.columns:
+        errors.append(f"Column '{position_column}' not found in Roster data")
+    return errors
+
+def filter_by_years(cmj_data, date_column, years, time_column=None):
+    """Keep tests from the given years; dates are parsed and a Year column added
+
+    The result is sorted by test date (and time, if time_column is given).
+    """
+    return DateIndexedData.build(cmj_data, date_column, time_column).years(years)
+
+def filter_by_date_range(cmj_data, date_column, start_date, end_date, time_column=None):
+    """Keep tests dated between start_date and end_date (inclusive)
+
+    The result is sorted by test date (and time, if time_column is given).
+    """
+    return DateIndexedData.build(cmj_data, date_column, time_column).date_range(start_date, end_date)
+
+def merge_roster(cmj_data, roster_data, athlete_id_column, position_column):
+    """Left-join positions from the roster onto the CMJ data"""
+    return pd.merge(
+        cmj_data,
+        roster_data[[athlete_id_column, position_column]],
+        on=athlete_id_column,
+        how='left'
+    )
+
+def select_analysis_rows(merged_data, position_column, metric_columns):
+    """Remove rows without position or any of the selected metrics"""
+    columns_to_check = [position_column] + metric_columns
+    return merged_data.dropna(subset=columns_to_check)
+
+def individual_base_columns(analysis_data, athlete_id_column, position_column, display_date_column=None):
+    """Athlete, Position and (if available) Test Date columns of the Individual Results"""
+    base = pd.DataFrame({
+        'Athlete': analysis_data[athlete_id_column],
+        'Position': analysis_data[position_column],
+    })
+
+    # Always add test date if we have a date column
+    if display_date_column and display_date_column in analysis_data.columns:
+        base['Test Date'] = format_test_dates(analysis_data[display_date_column])
+    return base
+
+def individual_metric_columns(analysis_data, athlete_id_column, position_column, metric_columns,
+                              baseline_timestamps=None, last_n=ATHLETE_BASELINE_TESTS,
+                              window_days=POSITION_BASELINE_DAYS):
+    """Each metric's Individual Results columns: value, percentile rank and rolling ranks
+
+    Columns are grouped per metric in display order, aligned with
+    analysis_data. Metrics are independent, so the columns of a set of
+    metrics equal the columns of each metric computed separately.
+    """
+    # Rank every record against its position for all metrics in one pass
+    percentile_ranks = calculate_percentile_ranks(analysis_data, position_column, metric_columns)
+    rolling_ranks = None
+    if baseline_timestamps is not None:
+        rolling_ranks = calculate_rolling_percentiles(
+            analysis_data, athlete_id_column, position_column, metric_columns, baseline_timestamps,
+            last_n=last_n, window_days=window_days
+        )
+
+    # Add each metric and its percentile rank (keep as floats for color styling)
+    columns = {}
+    for metric_col in metric_columns:
+        columns[metric_col] = restore_float64(analysis_data[metric_col]).round(2)
+        columns[f'{metric_col}_Percentile'] = percentile_ranks[f'{metric_col}_Percentile']
+        if rolling_ranks is not None:
+            for column in (athlete_baseline_column(metric_col, last_n), position_baseline_column(metric_col, window_days)):
+                columns[column] = rolling_ranks[column]
+    return pd.DataFrame(columns, index=analysis_data.index)
+
+def assemble_individual_results(base_columns, metric_frames, metric_columns):
+    """Join the base columns and per-metric columns, sorted by the first metric's rank"""
+    individual_df = pd.concat([base_columns] + list(metric_frames), axis=1).reset_index(drop=True)
+
+    # Sort by first metric's percentile rank
+    first_metric_percentile = f'{metric_columns[0]}_Percentile'
+    if first_metric_percentile in individual_df.columns:
+        individual_df = individual_df.sort_values(first_metric_percentile, ascending=False)
+    return individual_df
+
+def build_individual_results(analysis_data, athlete_id_column, position_column, metric_columns,
+                             display_date_column=None, baseline_timestamps=None,
+                             last_n=ATHLETE_BASELINE_TESTS, window_days=POSITION_BASELINE_DAYS):
+    """Build the Individual Results table, sorted by the first metric's rank
+
+    With baseline_timestamps (each test's date/time, aligned with
+    analysis_data), every metric also gets the rolling baseline ranks of
+    calculate_rolling_percentiles: against the athlete's last_n previous
+    tests and the position's trailing window_days.
+    """
+    return assemble_individual_results(
+        individual_base_columns(analysis_data, athlete_id_column, position_column, display_date_column),
+        [individual_metric_columns(analysis_data, athlete_id_column, position_column, metric_columns,
+                                   baseline_timestamps, last_n, window_days)],
+        metric_columns
+    )
+
+def filter_individual_results(individual_df, athletes=None, positions=None, start_date=None, end_date=None):
+    """Narrow the Individual Results table for display
+
+    Empty selections mean no filter. Dates compare against the 'Test Date'
+    column's YYYY-MM-DD text, so 'N/A' rows drop out of any date range.
+    """
+    mask = pd.Series(True, index=individual_df.index)
+    if athletes:
+        mask &= individual_df['Athlete'].isin(athletes)
+    if positions:
+        mask &= individual_df['Position'].isin(positions)
+    if 'Test Date' in individual_df.columns:
+        test_dates = individual_df['Test Date']
+        if start_date is not None:
+            mask &= (test_dates >= str(start_date)) & (test_dates != 'N/A')
+        if end_date is not None:
+            mask &= (test_dates <= str(end_date)) & (test_dates != 'N/A')
+    return individual_df[mask]
+
+def prepare_analysis_data(cmj_data, roster_data, athlete_id_column, position_column, metric_columns,
+                          match_names=True, outlier_threshold=None):
+    """Validate, resolve names, merge positions and keep the rows that can be analyzed
+
+    With outlier_threshold, tests failing screen_tests at that robust
+    z-score are excluded. Returns (merged_data, no_position, analysis_data,
+    name_matches). Raises ValueError if the columns are invalid or no rows
+    remain, saying whether screening removed the last of them.
+    """
+    roster_data = roster_with_athlete_column(roster_data, athlete_id_column)
+    errors = validate_columns(cmj_data, roster_data, athlete_id_column, position_column, metric_columns)
+    if errors:
+        raise ValueError("; ".join(errors))
+
+    name_matches = None
+    if match_names:
+        cmj_data, name_matches = resolve_roster_names(cmj_data, roster_data, athlete_id_column)
+    merged_data = merge_roster(cmj_data, roster_data, athlete_id_column, position_column)
+    no_position = merged_data[merged_data[position_column].isna()]
+    analysis_data = select_analysis_rows(merged_data, position_column, metric_columns)
+    if len(analysis_data) == 0:
+        raise ValueError("No valid data to analyze after removing rows with missing position or metric values")
+    if outlier_threshold is not None:
+        analysis_data = exclude_outliers(analysis_data, position_column, metric_columns, outlier_threshold)
+        if len(analysis_data) == 0:
+            raise ValueError(f"Every test failed data quality screening at a robust z-score of {outlier_threshold:g}")
+    return merged_data, no_position, analysis_data, name_matches
+
+def run_analysis(cmj_data, roster_data, athlete_id_column, position_column, metric_columns,
+                 display_date_column=None, match_names=True, outlier_threshold=None):
+    """Run the whole analysis on already loaded (and filtered) CMJ data
+
+    display_date_column defaults to the first detected date column, as in
+    the app. With match_names, CMJ names are resolved to roster names by
+    resolve_roster_names before the merge. With outlier_threshold, tests
+    failing data quality screening are excluded. Raises ValueError if the
+    columns are invalid or no rows remain.
+    """
+    merged_data, no_position, analysis_data, name_matches = prepare_analysis_data(
+        cmj_data, roster_data, athlete_id_column, position_column, metric_columns, match_names, outlier_threshold
+    )
+    if display_date_column is None:
+        potential_date_cols = detect_date_columns(cmj_data)
+        display_date_column = potential_date_cols[0] if potential_date_cols else None
+
+    return AnalysisResult(
+        merged_data=merged_data,
+        no_position=no_position,
+        analysis_data=analysis_data,
+        normative_dfs=calculate_position_norms(analysis_data, position_column, metric_columns),
+        individual_df=build_individual_results(
+            analysis_data, athlete_id_column, position_column, metric_columns, display_date_column
+        ),
+        positions=sorted(analysis_data[position_column].unique()),
+        name_matches=name_matches
+    )
@@ -0,0 +1,100 @@
+"""Screening tests for mis-trials with robust per-position outlier rules"""
+import numpy as np
+import pandas as pd
+
+from .ingest import restore_float64
+
+# Robust z-score above which a test is an outlier for its position
+# (Iglewicz and Hoaglin's cut-off for the modified z-score)
+SCREENING_Z_THRESHOLD = 3.5
+# Positions with fewer tests of a metric are not z-screened on it
+SCREENING_MIN_TESTS = 10
+# Scale that makes the MAD estimate the SD of normal data
+MAD_TO_SD = 1.4826
+# What happens to tests that fail screening
+SCREENING_ACTIONS = {
+    'flag': 'Flag only (keep in the norms)',
+    'exclude': 'Exclude from the norms and rankings',
+}
+SCREENING_REASON_COLUMN = 'Screening Reason'
+
+
+def robust_position_stats(data, position_col, metric_columns):
+    """Median, robust SD and test count of each metric per position
+
+    The robust SD is the scaled MAD. All metrics are reduced together: a
+    grouped median of the values, then of the absolute deviations. Returns
+    (medians, spreads, counts), DataFrames indexed by position with one
+    column per metric.
+    """
+    values = pd.DataFrame({col: restore_float64(data[col]).astype(float) for col in metric_columns}, index=data.index)
+    positions = data[position_col]
+    grouped = values.groupby(positions, observed=True, sort=False)
+    medians, counts = grouped.median(), grouped.count()
+
+    deviations = (values - medians.reindex(positions).to_numpy()).abs()
+    spreads = deviations.groupby(positions, observed=True, sort=False).median() * MAD_TO_SD
+    return medians, spreads, counts
+
+def robust_z_scores(data, position_col, metric_columns, stats=None):
+    """Each test's robust z-score per metric within its position, aligned with data
+
+    Missing where the position has fewer than SCREENING_MIN_TESTS tests of
+    the metric, or where more than half of them share one value (MAD 0, as
+    for counts like reps), which leaves no spread to measure against. stats
+    is the result of robust_position_stats, computed if not given.
+    """
+    medians, spreads, counts = stats or robust_position_stats(data, position_col, metric_columns)
+    positions = data[position_col]
+    scores = {}
+    for metric_col in metric_columns:
+        values = restore_float64(data[metric_col]).to_numpy(dtype=float)
+        median = positions.map(medians[metric_col]).to_numpy(dtype=float)
+        spread = positions.map(spreads[metric_col]).to_numpy(dtype=float)
+        enough = positions.map(counts[metric_col]).to_numpy(dtype=float) >= SCREENING_MIN_TESTS
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scores[metric_col] = np.where(enough & (spread > 0), (values - median) / spread, np.nan)
+    return pd.DataFrame(scores, index=data.index)
+
+def screen_tests(data, position_col, metric_columns, z_threshold=SCREENING_Z_THRESHOLD, zero_is_invalid=True):
+    """Why each test fails screening, as text aligned with data ('' for tests that pass)
+
+    A test fails on a metric when its robust z-score within the position is
+    beyond z_threshold, or (with zero_is_invalid) when the value is exactly
+    0 while the position's median is not, e.g. a jump with no height; a
+    metric that is usually 0 (like added load) does not fail. The reason
+    names each failing metric.
+    """
+    stats = robust_position_stats(data, position_col, metric_columns)
+    z_scores = robust_z_scores(data, position_col, metric_columns, stats)
+    reasons = np.full(len(data), '', dtype=object)
+    for metric_col in metric_columns:
+        z = z_scores[metric_col].to_numpy()
+        with np.errstate(invalid='ignore'):
+            outlier = np.abs(z) > z_threshold
+        if zero_is_invalid:
+            zero = ((restore_float64(data[metric_col]) == 0).to_numpy()
+                    & (data[position_col].map(stats[0][metric_col]).to_numpy(dtype=float) != 0))
+            outlier &= ~zero
+            for row in np.flatnonzero(zero):
+                reasons[row] += f'; {metric_col} is 0'
+        # Only failing tests get a reason formatted, so the loops stay short
+        for row in np.flatnonzero(outlier):
+            reasons[row] += f'; {metric_col} robust z {z[row]:+.1f}'
+    return pd.Series(reasons, index=data.index, name=SCREENING_REASON_COLUMN).str.removeprefix('; ')
+
+def screening_report(data, reasons, athlete_id_column, position_col, metric_columns, date_column=None):
+    """Tests that failed screening with their reason and (exact) metric values"""
+    columns = [athlete_id_column, position_col]
+    if date_column and date_column in data.columns:
+        columns.append(date_column)
+    failed = reasons != ''
+    return data.loc[failed, columns].assign(
+        **{col: restore_float64(data.loc[failed, col]) for col in metric_columns},
+        **{SCREENING_REASON_COLUMN: reasons[failed]}
+    ).reset_index(drop=True)
+
+def exclude_outliers(data, position_col, metric_columns, z_threshold=SCREENING_Z_THRESHOLD, zero_is_invalid=True):
+    """data without the tests that fail screen_tests"""
+    reasons = screen_tests(data, position_col, metric_columns, z_threshold, zero_is_invalid)
+    return data[(reasons == '').to_numpy()]
@@ -0,0 +1,297 @@
+"""Local HTTP scoring service: percentile ranks of new test values against the norms
+
+Example:
+
+    python -m cmj_norms serve --cmj CMJ_Data_Cleaned.csv --roster Roster_Cleaned.csv --port 8765
+
+    curl -X POST localhost:8765/score -d '{"tests": [
+        {"athlete": "John Smith", "metric": "Jump Height (Imp-Mom) in Inches [in]", "value": 17.2},
+        {"position": "WR", "metric": "Peak Power [W]", "value": 5400}
+    ]}'
+
+Each test is ranked against its position's values with the rule of
+calculate_percentile_ranks and gets a performance_category. The position is
+given directly or looked up from the roster by athlete name. The norms are
+rebuilt only when the CMJ or roster file contents change.
+
+With ``--artifact`` the norms come from a compiled artifact (see
+cmj_norms.artifact) instead, scored by position only since it carries no
+roster.
+"""
+import json
+import sys
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+from .artifact import ALL_POSITIONS, NormsArtifact
+from .ingest import (default_metric_columns, detect_athlete_column, detect_position_column, file_digest,
+                     load_data, restore_float64)
+from .matching import combine_name_columns, normalize_names, roster_with_athlete_column
+from .norms import performance_category
+from .pipeline import prepare_analysis_data
+
+# Largest request body accepted, in bytes
+MAX_REQUEST_BYTES = 10_000_000
+
+
+@dataclass
+class ScoringNorms:
+    """Sorted values of every (position, metric), ready for binary-search ranking"""
+    values: dict
+    athlete_positions: dict
+    athlete_keys: dict
+    metrics: list
+    positions: list
+    loaded_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def build(cls, cmj_data, roster_data, athlete_id_column, position_column, metric_columns, match_names=True):
+        """Sort each position's values once, with the app's merge and row selection"""
+        _, _, analysis_data, _ = prepare_analysis_data(
+            cmj_data, roster_data, athlete_id_column, position_column, metric_columns, match_names
+        )
+        values = {}
+        for metric_col in metric_columns:
+            metric_values = restore_float64(analysis_data[metric_col]).to_numpy(dtype=float)
+            for position, rows in analysis_data.groupby(position_column, observed=True).indices.items():
+                values[(str(position), metric_col)] = np.sort(metric_values[rows])
+            values[(ALL_POSITIONS, metric_col)] = np.sort(metric_values)
+
+        roster = roster_with_athlete_column(roster_data, athlete_id_column)
+        roster = roster[[athlete_id_column, position_column]].dropna().drop_duplicates(athlete_id_column)
+        athletes = roster[athlete_id_column].astype(str).tolist()
+        athlete_positions = dict(zip(athletes, roster[position_column].astype(str)))
+        # Normalized names find athletes despite case, punctuation or name order; first athlete wins
+        athlete_keys = {}
+        for key, athlete in zip(normalize_names(athletes), athletes):
+            if key:
+                athlete_keys.setdefault(key, athlete)
+
+        positions = sorted({position for position, _ in values if position != ALL_POSITIONS})
+        return cls(values, athlete_positions, athlete_keys, list(metric_columns), positions)
+
+    @classmethod
+    def from_artifact(cls, artifact):
+        """Score against a loaded NormsArtifact; its values stay memory-mapped"""
+        values = {}
+        for metric_col in artifact.metrics:
+            for position in artifact.positions + [ALL_POSITIONS]:
+                group_values = artifact.values(position, metric_col)
+                if group_values is not None:
+                    values[(position, metric_col)] = group_values
+        return cls(values, {}, {}, artifact.metrics, artifact.positions)
+
+    def position_of(self, athlete):
+        """Roster position of an athlete (exact, then normalized name), or None"""
+        athlete = str(athlete)
+        if athlete not in self.athlete_positions:
+            athlete = self.athlete_keys.get(normalize_names([athlete])[0])
+        return self.athlete_positions.get(athlete)
+
+    def score(self, tests):
+        """Percentile rank and category of each test dict (athlete or position, metric, value)
+
+        Tests are grouped by (position, metric) so each group is ranked with
+        one searchsorted call. Returns one result dict per test, in order;
+        tests that cannot be scored get an 'error' instead.
+        """
+        results = [None] * len(tests)
+        pending = defaultdict(list)
+        for i, test in enumerate(tests):
+            if not isinstance(test, dict):
+                results[i] = {'error': "Each test must be an object"}
+                continue
+            metric = test.get('metric')
+            position = test.get('position')
+            if position is None and test.get('athlete') is not None:
+                position = self.position_of(test['athlete'])
+                if position is None:
+                    results[i] = {'error': f"Athlete '{test['athlete']}' not found in roster"}
+                    continue
+            try:
+                value = float(test.get('value'))
+            except (TypeError, ValueError):
+                value = np.nan
+            if position is None:
+                results[i] = {'error': "Each test needs an 'athlete' or a 'position'"}
+            elif metric not in self.metrics:
+                results[i] = {'error': f"Unknown metric '{metric}'"}
+            elif (str(position), metric) not in self.values:
+                results[i] = {'error': f"No norms for position '{position}'"}
+            elif np.isnan(value):
+                results[i] = {'error': "'value' must be a number"}
+            else:
+                pending[(str(position), metric)].append((i, value))
+
+        for (position, metric), items in pending.items():
+            norm_values = self.values[(position, metric)]
+            rows, test_values = zip(*items)
+            # Share of the position's values strictly below the test, as in calculate_percentile_ranks
+            ranks = np.round(norm_values.searchsorted(test_values, side='left') / len(norm_values) * 100, 2)
+            for row, rank, category in zip(rows, ranks, performance_category(ranks)):
+                results[row] = {**tests[row], 'position': position, 'percentile': float(rank),
+                                'category': category, 'n': len(norm_values)}
+        return results
+
+    def summary(self):
+        """Positions, metrics and group sizes, for GET /norms"""
+        return {
+            'loaded_at': datetime.fromtimestamp(self.loaded_at).isoformat(timespec='seconds'),
+            'metrics': self.metrics,
+            'positions': self.positions,
+            'athletes': len(self.athlete_positions),
+            'n': {metric: {position: len(self.values[(position, metric)])
+                           for position in self.positions + [ALL_POSITIONS]
+                           if (position, metric) in self.values}
+                  for metric in self.metrics},
+        }
+
+class NormsStore:
+    """Current ScoringNorms for a (CMJ file, roster file) pair, rebuilt when either changes
+
+    A file's size and modification time are checked on every request; only
+    when they change is it hashed, and only a new digest rebuilds the norms,
+    so touching a file or rewriting identical contents keeps the cache.
+    A rebuild that fails (e.g. a file caught mid-write) keeps serving the
+    previous norms.
+    """
+
+    def __init__(self, cmj_path, roster_path, athlete_id_column=None, position_column=None,
+                 metric_columns=None, match_names=True):
+        self.athlete_id_column = athlete_id_column
+        self.position_column = position_column
+        self.metric_columns = metric_columns
+        self.match_names = match_names
+        self._watch(cmj_path, roster_path)
+
+    def _watch(self, *paths):
+        """Start serving norms built from paths"""
+        self.paths = tuple(Path(path) for path in paths)
+        self._lock = threading.Lock()
+        self._stats = None
+        self._digests = None
+        self._norms = None
+        self.reload()
+
+    def _file_stats(self):
+        return tuple((path.stat().st_mtime_ns, path.stat().st_size) for path in self.paths)
+
+    def _build(self):
+        # Same loading and column detection as the batch runner
+        cmj_data = combine_name_columns(load_data(self.paths[0]))[0]
+        roster_data = combine_name_columns(load_data(self.paths[1]))[0]
+        athlete_id_column = self.athlete_id_column or detect_athlete_column(cmj_data, roster_data)
+        position_column = self.position_column or detect_position_column(roster_data)
+        metric_columns = self.metric_columns or default_metric_columns(cmj_data)[1]
+        return ScoringNorms.build(cmj_data, roster_data, athlete_id_column, position_column, metric_columns,
+                                  self.match_names)
+
+    def reload(self):
+        """Rebuild the norms if the files' contents changed; returns whether they were rebuilt"""
+        with self._lock:
+            stats = self._file_stats()
+            if stats == self._stats:
+                return False
+            digests = tuple(file_digest(path) for path in self.paths)
+            self._stats = stats
+            if digests == self._digests:
+                return False
+            try:
+                norms = self._build()
+            except Exception as e:
+                if self._norms is None:
+                    raise
+                print(f"Keeping previous norms, reload failed: {e}", file=sys.stderr)
+                return False
+            self._digests = digests
+            self._norms = norms
+            return True
+
+    @property
+    def norms(self):
+        """Up-to-date norms; readers keep the object they got even if a reload replaces it"""
+        try:
+            self.reload()
+        except OSError as e:
+            print(f"Keeping previous norms, cannot read data files: {e}", file=sys.stderr)
+        return self._norms
+
+class ArtifactStore(NormsStore):
+    """Current ScoringNorms of a compiled artifact, reloaded when the file is replaced"""
+
+    def __init__(self, artifact_path):
+        self._watch(artifact_path)
+
+    def _build(self):
+        return ScoringNorms.from_artifact(NormsArtifact.load(self.paths[0]))
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    """GET /health, GET /norms and POST /score against the server's NormsStore"""
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        elif self.path == '/norms':
+            self._send_json(200, self.server.store.norms.summary())
+        else:
+            self._send_json(404, {'error': f"Unknown path '{self.path}'"})
+
+    def do_POST(self):
+        if self.path != '/score':
+            self._send_json(404, {'error': f"Unknown path '{self.path}'"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send_json(400, {'error': "Content-Length must be a non-negative integer"})
+            return
+        if length > MAX_REQUEST_BYTES:
+            self._send_json(413, {'error': f"Request larger than {MAX_REQUEST_BYTES} bytes"})
+            return
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError as e:
+            self._send_json(400, {'error': f"Invalid JSON: {e}"})
+            return
+        tests = request.get('tests') if isinstance(request, dict) else None
+        if not isinstance(tests, list):
+            self._send_json(400, {'error': "Body must be an object with a 'tests' list"})
+            return
+        self._send_json(200, {'results': self.server.store.norms.score(tests)})
+
+def make_server(store, host='127.0.0.1', port=8765):
+    """A threaded HTTP server answering ScoringHandler requests from store"""
+    server = ThreadingHTTPServer((host, port), ScoringHandler)
+    server.store = store
+    return server
+
+def serve(store, host='127.0.0.1', port=8765):
+    """Serve until interrupted"""
+    server = make_server(store, host, port)
+    norms = store.norms
+    print(f"Scoring {len(norms.metrics)} metrics for {len(norms.positions)} positions "
+          f"on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
@@ -0,0 +1,81 @@
+"""Collapsing repeated tests into one row per athlete per session (test day)"""
+import numpy as np
+
+from .dates import parse_dates
+from .ingest import restore_float64
+
+# How a session's tests are combined into one value per metric. Values are
+# ranked highest first for every metric, including those where lower is better
+SESSION_AGGREGATIONS = {
+    'highest': 'Highest test',
+    'mean': 'Mean of all tests',
+    'top2': 'Mean of highest 2 tests',
+}
+# Column added with the number of tests each session row combines
+SESSION_TESTS_COLUMN = 'Session Tests'
+
+
+def session_codes(data, athlete_id_column, date_column):
+    """Session number of each row: same athlete on the same calendar day
+
+    Rows without a date are sessions of their own.
+    """
+    days = parse_dates(data[date_column]).dt.normalize()
+    sessions = data.groupby([data[athlete_id_column], days], sort=False, observed=True, dropna=False)
+    codes = sessions.ngroup().to_numpy(copy=True)
+    undated = (days.isna() | data[athlete_id_column].isna()).to_numpy()
+    codes[undated] = codes.max() + 1 + np.arange(undated.sum())
+    return codes
+
+def aggregate_sessions(data, athlete_id_column, date_column, metric_columns, method='highest'):
+    """One row per athlete per test day, with each metric combined by method
+
+    method is a key of SESSION_AGGREGATIONS: the highest value ('highest'),
+    the mean of all tests ('mean') or the mean of the two highest values
+    ('top2'); missing values are ignored. Other columns keep the session's
+    first test, sessions keep the order of their first test, and
+    SESSION_TESTS_COLUMN counts the tests combined.
+
+    Rows are sorted by session once and every metric is reduced over the
+    same session boundaries; 'top2' additionally orders each metric's
+    values within sessions.
+    """
+    if method not in SESSION_AGGREGATIONS:
+        raise ValueError(f"Unknown session aggregation '{method}'")
+    if len(data) == 0:
+        return data.assign(**{SESSION_TESTS_COLUMN: np.array([], dtype=int)})
+    codes = session_codes(data, athlete_id_column, date_column)
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    sizes = np.diff(np.r_[starts, len(codes)])
+
+    aggregated = {}
+    for metric_col in metric_columns:
+        values = restore_float64(data[metric_col]).to_numpy(dtype=float)
+        if method == 'top2':
+            # Highest values first within each session; missing values sort last
+            ranked = values[np.lexsort((-values, codes))]
+            first = ranked[starts]
+            second = np.where(sizes > 1, ranked[np.minimum(starts + 1, len(ranked) - 1)], np.nan)
+            with np.errstate(invalid='ignore'):
+                aggregated[metric_col] = np.where(np.isnan(second), first, (first + second) / 2)
+            continue
+        session_values = values[order]
+        present = ~np.isnan(session_values)
+        counts = np.add.reduceat(present, starts)
+        if method == 'highest':
+            combined = np.fmax.reduceat(session_values, starts)
+        else:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                combined = np.add.reduceat(np.where(present, session_values, 0), starts) / counts
+        aggregated[metric_col] = np.where(counts > 0, combined, np.nan)
+
+    # Sessions in the order of their first test
+    first_rows = order[starts]
+    session_order = np.argsort(first_rows, kind='stable')
+    sessions = data.iloc[first_rows[session_order]].assign(
+        **{metric_col: values[session_order] for metric_col, values in aggregated.items()},
+        **{SESSION_TESTS_COLUMN: sizes[session_order]}
+    )
+    return sessions.reset_index(drop=True)
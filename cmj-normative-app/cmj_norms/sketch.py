@@ -0,0 +1,193 @@
+"""Bounded-memory norms for very large CSV exports using mergeable quantile sketches"""
+import numpy as np
+import pandas as pd
+
+from .ingest import ASYMMETRY_MAGNITUDE_SUFFIX, convert_asymmetry_columns, detect_asymmetry_columns
+from .norms import NORMATIVE_COLUMNS
+
+# Streaming mode settings: rows parsed per CSV chunk and items kept per sketch
+# level (the analysis is configured from ingest.SNIFF_SAMPLE_ROWS rows)
+STREAM_CHUNK_ROWS = 100_000
+SKETCH_LEVEL_SIZE = 4096
+
+class QuantileSketch:
+    """Mergeable KLL-style quantile sketch with a tracked worst-case rank error
+
+    Values are buffered at level 0 with weight 1. When a level holds more than
+    level_size items it is sorted and every other item (random start offset)
+    is promoted to the next level with double weight. Each compaction at
+    level h shifts any rank by at most 2**h, so the sum over all compactions
+    performed (max_rank_error) bounds how far a reported quantile's rank can
+    be from the exact one. That worst case grows like log2(n / level_size) *
+    n / level_size; until the first compaction the sketch is exact and
+    quantiles() equals np.percentile.
+    """
+
+    def __init__(self, level_size=SKETCH_LEVEL_SIZE, seed=0):
+        self.level_size = level_size
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.max_rank_error = 0
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        """Add a batch of values (missing values are ignored)"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.count += len(values)
+        self._compact()
+
+    def merge(self, other):
+        """Fold another sketch into this one"""
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self.max_rank_error += other.max_rank_error
+        self._compact()
+
+    def _compact(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self.level_size:
+                items = np.sort(items)
+                # Keep one item back when the count is odd so pairs stay whole
+                kept, items = items[:len(items) % 2], items[len(items) % 2:]
+                promoted = items[self._rng.integers(2)::2]
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level] = kept
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                self.max_rank_error += 2 ** level
+            level += 1
+
+    def quantiles(self, levels):
+        """Estimate quantiles (0-1) with np.percentile's linear interpolation"""
+        if self.count == 0:
+            return np.full(len(levels), np.nan)
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        values = values[order]
+        cumulative = np.cumsum(weights[order])
+
+        # Fractional 0-based rank of each quantile, read between its neighbours
+        ranks = np.asarray(levels) * (cumulative[-1] - 1)
+        lower = values[np.searchsorted(cumulative, np.floor(ranks), side='right')]
+        upper = values[np.searchsorted(cumulative, np.ceil(ranks), side='right')]
+        return lower + (upper - lower) * (ranks - np.floor(ranks))
+
+    @property
+    def rank_error(self):
+        """Worst-case rank error as a fraction of the values seen"""
+        return self.max_rank_error / self.count if self.count else 0.0
+
+class RunningStats:
+    """Mergeable count, mean, variance, min and max (Chan et al. updates)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.nan
+        self.max = np.nan
+
+    def update(self, values):
+        """Add a batch of values (missing values are ignored)"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            batch = RunningStats()
+            batch.count = len(values)
+            batch.mean = values.mean()
+            batch.m2 = ((values - batch.mean) ** 2).sum()
+            batch.min = values.min()
+            batch.max = values.max()
+            self.merge(batch)
+
+    def merge(self, other):
+        """Fold another set of running statistics into this one"""
+        if other.count == 0:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+
+    @property
+    def std(self):
+        """Sample standard deviation, matching pandas' default"""
+        return np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+
+def stream_position_norms(file, roster_data, athlete_id_column, position_column, metric_cols,
+                          chunksize=STREAM_CHUNK_ROWS, level_size=SKETCH_LEVEL_SIZE):
+    """Calculate normative tables from a CSV export without loading it whole
+
+    The CSV is read in chunks of only the needed columns; each chunk is joined
+    to the roster and folded into one QuantileSketch and RunningStats per
+    (position, metric). The ALL POSITIONS row merges the position sketches.
+    Memory is bounded by the chunk size plus about level_size *
+    log2(n / level_size) values per sketch.
+
+    Returns (normative_dfs, max_rank_error) with normative_dfs shaped like
+    calculate_position_norms. Mean, SD, Min, Max and N are exact;
+    each percentile is within max_rank_error (a fraction of N, worst case over
+    all sketches) in rank of the exact calculate_percentiles value, and is
+    exact whenever a position has at most level_size values.
+    """
+    # Magnitude metrics are derived from their asymmetry column while reading
+    magnitude_sources = [col[:-len(ASYMMETRY_MAGNITUDE_SUFFIX)] for col in metric_cols
+                         if col.endswith(ASYMMETRY_MAGNITUDE_SUFFIX)]
+    needed = {athlete_id_column, *metric_cols, *magnitude_sources}
+    roster_positions = roster_data[[athlete_id_column, position_column]]
+    sketches = {}
+
+    file.seek(0)
+    reader = pd.read_csv(file, chunksize=chunksize, usecols=lambda col: col.strip() in needed)
+    for chunk in reader:
+        chunk.columns = chunk.columns.str.strip()
+        chunk = convert_asymmetry_columns(
+            chunk, sorted(set(detect_asymmetry_columns(chunk)) | set(magnitude_sources))
+        )
+        chunk = chunk.merge(roster_positions, on=athlete_id_column, how='left')
+        # Same rows as the in-memory path keeps for analysis
+        chunk = chunk.dropna(subset=[position_column] + metric_cols)
+        for position, position_chunk in chunk.groupby(position_column, observed=True):
+            for metric_col in metric_cols:
+                if (position, metric_col) not in sketches:
+                    sketches[(position, metric_col)] = (QuantileSketch(level_size), RunningStats())
+                sketch, stats = sketches[(position, metric_col)]
+                sketch.update(position_chunk[metric_col].values)
+                stats.update(position_chunk[metric_col].values)
+
+    positions = sorted({position for position, _ in sketches})
+    quantile_levels = [0.25, 0.5, 0.75, 0.9]
+    normative_dfs = {}
+    max_rank_error = 0.0
+    for metric_col in metric_cols:
+        overall_sketch, overall_stats = QuantileSketch(level_size), RunningStats()
+        rows = []
+        for position in positions + ['ALL POSITIONS']:
+            if position == 'ALL POSITIONS':
+                sketch, stats = overall_sketch, overall_stats
+            else:
+                sketch, stats = sketches[(position, metric_col)]
+                overall_sketch.merge(sketch)
+                overall_stats.merge(stats)
+            max_rank_error = max(max_rank_error, sketch.rank_error)
+            p25, p50, p75, p90 = sketch.quantiles(quantile_levels)
+            rows.append({
+                'Position': position,
+                'P25': p25, 'P50 (Median)': p50, 'P75': p75, 'P90': p90,
+                'Mean': stats.mean, 'SD': stats.std, 'Min': stats.min, 'Max': stats.max,
+                'N': stats.count
+            })
+        norms = pd.DataFrame(rows, columns=NORMATIVE_COLUMNS)
+        normative_dfs[metric_col] = norms.round({col: 2 for col in NORMATIVE_COLUMNS[1:-1]})
+    return normative_dfs, max_rank_error
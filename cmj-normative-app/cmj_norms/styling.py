@@ -0,0 +1,98 @@
+"""Baylor-branded table styling for normative and individual results"""
+import numpy as np
+import pandas as pd
+
+
+def color_percentile_columns(df):
+    """Apply gold-to-green gradient to entire percentile columns (Baylor branding)"""
+    # Map column names to their percentile level (0-100 scale)
+    column_percentile_map = {
+        'P25': 25,
+        'P50 (Median)': 50,
+        'P75': 75,
+        'P90': 90,
+        'Mean': 50  # Mean typically around median
+    }
+
+    def get_color_for_percentile(percentile_level):
+        """Get RGB color for a given percentile level (0-100)
+        Baylor colors: Gold (#FFB81C) to Green (#003015)
+        """
+        # Normalize to 0-1
+        norm = percentile_level / 100.0
+
+        # Baylor Gold RGB: (255, 184, 28)
+        # Baylor Green RGB: (0, 48, 21)
+
+        # Create gradient: gold (low percentile) -> green (high percentile)
+        r = int(255 * (1 - norm))
+        g = int(184 - (184 - 48) * norm)
+        b = int(28 - (28 - 21) * norm)
+
+        # Text color: white for dark backgrounds
+        text_color = 'white' if norm > 0.5 else 'black'
+
+        return f'background-color: rgb({r},{g},{b}); color: {text_color}; font-weight: bold;'
+
+    styles = pd.DataFrame('', index=df.index, columns=df.columns)
+
+    # Apply color to entire columns based on percentile level
+    for col_name, percentile_level in column_percentile_map.items():
+        if col_name in df.columns:
+            color = get_color_for_percentile(percentile_level)
+            # Apply same color to all cells in this column
+            styles[col_name] = [color] * len(df)
+
+    return styles
+
+def percentile_colors(values):
+    """CSS for each percentile rank (0-100): gold-to-green gradient (Baylor branding)
+
+    Vectorized over an array; missing values get no style.
+    """
+    values = np.asarray(values, dtype=float)
+    # Normalize to 0-1 (percentile is already 0-100)
+    norm = np.nan_to_num(values / 100.0)
+
+    # Baylor Gold RGB: (255, 184, 28)
+    # Baylor Green RGB: (0, 48, 21)
+    # Create gradient: gold (low) -> green (high)
+    r = (255 * (1 - norm)).astype(int).astype(str)
+    g = (184 - (184 - 48) * norm).astype(int).astype(str)
+    b = (28 - (28 - 21) * norm).astype(int).astype(str)
+
+    # Text color: white for dark backgrounds (higher percentiles)
+    text_color = np.where(norm > 0.5, 'white', 'black')
+
+    css = pd.Series('background-color: rgb(' + r + ',' + g + ',' + b + '); color: ' + text_color + '; font-weight: bold;')
+    return css.where(~np.isnan(values), '').to_numpy()
+
+def format_numbers(values):
+    """Format numbers to 2 decimals without trailing zeros, vectorized
+
+    Missing values become empty strings.
+    """
+    values = np.asarray(values, dtype=float)
+    formatted = np.char.rstrip(np.char.rstrip(np.char.mod('%.2f', values), '0'), '.')
+    return np.where(np.isnan(values), '', formatted)
+
+def style_normative_table(normative_df):
+    """Styler for one metric's normative table"""
+    return normative_df.style.apply(color_percentile_columns, axis=None)
+
+def style_results_page(page_df, metric_columns):
+    """Render one page of the Individual Results table for display
+
+    Metric and percentile columns stay numeric, so the table sorts them as
+    numbers, and get a display format; percentile ranks are colored. Both
+    are computed as whole-column array operations over just this page.
+    """
+    number_columns = [col for col in page_df.columns if col in metric_columns or 'Percentile' in col]
+    styles = pd.DataFrame('', index=page_df.index, columns=page_df.columns)
+    for col in number_columns:
+        if 'Percentile' in col:
+            styles[col] = percentile_colors(page_df[col])
+    # Labels are formatted for the whole page at once; the Styler only looks them up
+    values = page_df[number_columns].to_numpy(dtype=float).ravel()
+    labels = dict(zip(values, format_numbers(values)))
+    return page_df.style.apply(lambda _: styles, axis=None).format(labels.get, subset=number_columns, na_rep='')
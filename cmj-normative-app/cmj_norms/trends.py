@@ -0,0 +1,70 @@
+"""Per-athlete trends: direction and change of each metric over an athlete's tests"""
+import numpy as np
+import pandas as pd
+
+from .ingest import restore_float64
+
+# Fewest dated tests an athlete needs for a trend line
+MIN_TREND_TESTS = 3
+# Trend slopes are reported as change per this many days
+TREND_PERIOD_DAYS = 30
+_NS_PER_DAY = 86_400 * 10**9
+
+TREND_COLUMNS = ['Athlete', 'Position', 'Tests', 'First Test', 'Latest Test', 'First', 'Latest', 'Best',
+                 f'Trend per {TREND_PERIOD_DAYS} Days', 'Change Since First', 'Latest % of Best']
+
+
+def athlete_trends(data, athlete_col, position_col, metric_col, timestamps, min_tests=MIN_TREND_TESTS):
+    """One row per athlete with the direction and change of metric_col
+
+    timestamps holds each row's test date/time (aligned with data); tests
+    without a date or value are left out. Trend is the least-squares slope
+    of value on time, per TREND_PERIOD_DAYS days; athletes with fewer than
+    min_tests tests, or all on one day, get no trend. Change Since First is
+    the latest value minus the first, and Best the highest value.
+
+    Rows are sorted by athlete and time once; every athlete's line is then
+    fitted from grouped sums (bincount) of the centred times and values, so
+    the cost is one sort plus a few passes, not a fit per athlete.
+    """
+    values = restore_float64(data[metric_col]).to_numpy(dtype=float)
+    times = pd.to_datetime(timestamps).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    athlete_codes, athletes = pd.factorize(data[athlete_col], sort=True)
+    present = ~np.isnan(values) & ~pd.isna(timestamps).to_numpy() & (athlete_codes >= 0)
+    if not present.any():
+        return pd.DataFrame(columns=TREND_COLUMNS)
+    rows = np.flatnonzero(present)
+    rows = rows[np.lexsort((times[rows], athlete_codes[rows]))]
+    codes, values, times = athlete_codes[rows], values[rows], times[rows]
+
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(codes)] - 1
+    counts = ends - starts + 1
+    group = np.repeat(np.arange(len(starts)), counts)
+
+    # Days since each athlete's first test, centred on the athlete's mean
+    days = (times - times[starts][group]) / _NS_PER_DAY
+    days -= (np.bincount(group, days) / counts)[group]
+    centred_values = values - (np.bincount(group, values) / counts)[group]
+    sxx = np.bincount(group, days * days)
+    sxy = np.bincount(group, days * centred_values)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slopes = np.where((counts >= min_tests) & (sxx > 0), sxy / sxx * TREND_PERIOD_DAYS, np.nan)
+
+    first, latest = values[starts], values[ends]
+    best = np.maximum.reduceat(values, starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        latest_of_best = np.where(best > 0, latest / best * 100, np.nan)
+    return pd.DataFrame({
+        'Athlete': athletes[codes[starts]],
+        'Position': data[position_col].to_numpy()[rows[ends]],
+        'Tests': counts,
+        'First Test': pd.to_datetime(times[starts]).strftime('%Y-%m-%d'),
+        'Latest Test': pd.to_datetime(times[ends]).strftime('%Y-%m-%d'),
+        'First': first.round(2),
+        'Latest': latest.round(2),
+        'Best': best.round(2),
+        f'Trend per {TREND_PERIOD_DAYS} Days': slopes.round(3),
+        'Change Since First': (latest - first).round(2),
+        'Latest % of Best': latest_of_best.round(1),
+    }, columns=TREND_COLUMNS)